@@ -5,19 +5,34 @@ Caches Overture Maps building footprints as local GeoParquet files
 for fast repeated queries without S3 round-trips.
 """
 
+import atexit
 import json
 import math
+import queue
 import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import geopandas as gpd
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pyproj
+import shapely
 
 import overturemaps
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -25,12 +40,165 @@ DEFAULT_CACHE_DIR = Path("building_cache")
 AVG_BYTES_PER_BUILDING = 160  # empirical avg after dropping nested columns
 DEFAULT_DENSITY_PER_KM2 = 200  # rough avg; cities include lots of open land
 MAX_CACHE_AREA_KM2 = 10000  # ~100 km × 100 km safety limit
+ACCESS_FLUSH_INTERVAL_SECONDS = 30  # max delay before last_accessed is persisted
+# Parsed GeoDataFrames are kept in memory (LRU) until their summed building
+# count exceeds this; a single larger area is re-read from disk each time.
+GDF_CACHE_MAX_BUILDINGS = 1_000_000
+
+# Columns persisted per building; everything else (notably the deeply-nested
+# structs that bloat files and may fail round-trip) is projected away.
+# "bbox" is Overture's per-row xmin/ymin/xmax/ymax struct; it is declared as
+# the GeoParquet bbox covering so reads can skip row groups by bounds.
+_KEEP_COLUMNS = ("id", "geometry", "bbox", "height", "class", "subtype")
+
+# Rows buffered before each Parquet write (bounds memory and row-group count)
+_WRITE_CHUNK_ROWS = 65536
+
+# Large areas are downloaded as a grid of sub-bboxes fetched concurrently
+_DOWNLOAD_CELL_DEG = 0.25  # target sub-bbox edge length
+_DOWNLOAD_MAX_CELLS_PER_SIDE = 4
+_DOWNLOAD_WORKERS = 8
+_DOWNLOAD_QUEUE_SIZE = 32  # batches buffered between fetchers and the writer
+
+_UNLINK_WORKERS = 8  # concurrent file deletions in clear_all
+
+# GeoParquet file metadata for the WKB geometry column written by cache_area
+_GEO_METADATA = json.dumps({
+    "version": "1.1.0",
+    "primary_column": "geometry",
+    "columns": {
+        "geometry": {
+            "encoding": "WKB",
+            "geometry_types": [],
+            "crs": pyproj.CRS("EPSG:4326").to_json_dict(),
+            "covering": {
+                "bbox": {
+                    "xmin": ["bbox", "xmin"],
+                    "ymin": ["bbox", "ymin"],
+                    "xmax": ["bbox", "xmax"],
+                    "ymax": ["bbox", "ymax"],
+                },
+            },
+        },
+    },
+}).encode()
+
+
+def _has_bbox_covering(fp: Path) -> bool:
+    """Whether the GeoParquet file at *fp* declares a bbox covering column."""
+    geo = json.loads(pq.read_schema(str(fp)).metadata[b"geo"])
+    return "covering" in geo["columns"][geo["primary_column"]]
+
+
+def _select(
+    gdf: gpd.GeoDataFrame, geom: shapely.Geometry, predicate: Optional[str]
+) -> gpd.GeoDataFrame:
+    """Rows of *gdf* matching *geom* via its spatial index, in original order.
+
+    With ``predicate=None`` rows are matched on bounding-box overlap only.
+    GeoPandas keeps the STRtree on the frame, so frames held in the LRU
+    build it once and reuse it for every later query.
+    """
+    return gdf.iloc[np.sort(gdf.sindex.query(geom, predicate=predicate))]
+
 
-# Columns with deeply-nested structs that bloat files and may fail round-trip
-_DROP_COLUMNS = frozenset({
-    "bbox", "sources", "names", "categories", "brand",
-    "addresses", "websites", "socials", "emails", "phones",
-})
+# ---------------------------------------------------------------------------
+# Overture download helpers
+# ---------------------------------------------------------------------------
+def _split_bbox(
+    bbox: Tuple[float, float, float, float]
+) -> List[Tuple[float, float, float, float]]:
+    """Split *bbox* into a grid of roughly _DOWNLOAD_CELL_DEG-sized cells."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    nx = min(_DOWNLOAD_MAX_CELLS_PER_SIDE,
+             max(1, math.ceil((max_lon - min_lon) / _DOWNLOAD_CELL_DEG)))
+    ny = min(_DOWNLOAD_MAX_CELLS_PER_SIDE,
+             max(1, math.ceil((max_lat - min_lat) / _DOWNLOAD_CELL_DEG)))
+    xs = np.linspace(min_lon, max_lon, nx + 1)
+    ys = np.linspace(min_lat, max_lat, ny + 1)
+    return [
+        (float(xs[i]), float(ys[j]), float(xs[i + 1]), float(ys[j + 1]))
+        for j in range(ny) for i in range(nx)
+    ]
+
+
+def _owned_rows(
+    batch: pa.RecordBatch,
+    cell: Tuple[float, float, float, float],
+    bbox: Tuple[float, float, float, float],
+) -> pa.RecordBatch:
+    """Keep only rows whose (clamped) bbox min corner falls inside *cell*.
+
+    Buildings straddling a cell edge are returned by several sub-queries;
+    this assigns each one to exactly one cell so nothing is written twice.
+    """
+    rb = batch.column("bbox")
+    ox = pc.max_element_wise(pc.cast(rb.field("xmin"), pa.float64()), bbox[0])
+    oy = pc.max_element_wise(pc.cast(rb.field("ymin"), pa.float64()), bbox[1])
+    # Cells on the outer edge also own rows sitting exactly on that edge
+    x_hi = pc.less_equal if cell[2] >= bbox[2] else pc.less
+    y_hi = pc.less_equal if cell[3] >= bbox[3] else pc.less
+    mask = pc.and_(
+        pc.and_(pc.greater_equal(ox, cell[0]), x_hi(ox, cell[2])),
+        pc.and_(pc.greater_equal(oy, cell[1]), y_hi(oy, cell[3])),
+    )
+    return batch.filter(mask)
+
+
+def _iter_building_batches(
+    bbox: Tuple[float, float, float, float]
+) -> Iterator[pa.RecordBatch]:
+    """Yield Overture building batches for *bbox*.
+
+    Small areas use a single reader.  Larger ones are split with
+    _split_bbox and the sub-readers are consumed on a thread pool; batches
+    are handed back through a bounded queue so the caller can write them
+    out as they arrive.
+    """
+    cells = _split_bbox(bbox)
+    if len(cells) == 1:
+        yield from overturemaps.record_batch_reader("building", bbox)
+        return
+
+    batches: queue.Queue = queue.Queue(maxsize=_DOWNLOAD_QUEUE_SIZE)
+    finished = object()
+    stop = threading.Event()
+
+    def _fetch(cell):
+        try:
+            for batch in overturemaps.record_batch_reader("building", cell):
+                if stop.is_set():
+                    break
+                batch = _owned_rows(batch, cell, bbox)
+                if batch.num_rows:
+                    batches.put(batch)
+            batches.put(finished)
+        except BaseException as exc:
+            batches.put(exc)
+
+    workers = min(_DOWNLOAD_WORKERS, len(cells))
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix="overture-") as pool:
+        for cell in cells:
+            pool.submit(_fetch, cell)
+        remaining = len(cells)
+        try:
+            while remaining:
+                item = batches.get()
+                if item is finished:
+                    remaining -= 1
+                elif isinstance(item, BaseException):
+                    remaining -= 1
+                    raise item
+                else:
+                    yield item
+        finally:
+            # Unblock fetchers still waiting on a full queue
+            stop.set()
+            while remaining:
+                item = batches.get()
+                if item is finished or isinstance(item, BaseException):
+                    remaining -= 1
 
 
 # ---------------------------------------------------------------------------
@@ -50,6 +218,14 @@ def get_cache_manager() -> "CacheManager":
 # ---------------------------------------------------------------------------
 # CacheManager
 # ---------------------------------------------------------------------------
+class _IndexSnapshot(NamedTuple):
+    """Immutable read view of the index, replaced wholesale on every change."""
+    areas: Tuple[dict, ...]
+    by_id: Dict[str, dict]
+    tree: shapely.STRtree
+    bbox_arr: np.ndarray  # (N, 4) float64, row i is areas[i]["bbox"]
+
+
 class CacheManager:
     """Manages a directory of cached GeoParquet files."""
 
@@ -59,6 +235,17 @@ class CacheManager:
         self._lock = threading.Lock()
         self._index_mtime: float = 0
         self._index: dict = self._load_index()
+        self._publish_snapshot()
+        # Pending last_accessed updates (area_id -> epoch seconds), coalesced
+        # and written by the next _save_index — at the latest when the flush
+        # timer fires or the process exits.
+        self._dirty_access: Dict[str, float] = {}
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush_access_times)
+        # Recently loaded areas keyed by (area_id, columns), most recent last
+        self._gdf_cache: "OrderedDict[tuple, gpd.GeoDataFrame]" = OrderedDict()
+        self._gdf_cached_rows = 0  # sum of len() over _gdf_cache values
+        self._gdf_lock = threading.Lock()
 
     # -- Index persistence -----------------------------------------------------
 
@@ -69,28 +256,87 @@ class CacheManager:
         p = self._index_path()
         if p.exists():
             self._index_mtime = p.stat().st_mtime
+            if orjson is not None:
+                return orjson.loads(p.read_bytes())
             with open(p) as f:
                 return json.load(f)
         return {"areas": []}
 
     def _save_index(self):
+        if self._dirty_access:
+            # Copy-on-write: the published snapshot's dicts are read without
+            # the lock, so updated entries are replaced rather than mutated
+            areas = []
+            for a in self._index["areas"]:
+                ts = self._dirty_access.get(a["id"])
+                if ts is not None:
+                    a = dict(a, last_accessed=datetime.fromtimestamp(
+                        ts, timezone.utc
+                    ).isoformat())
+                areas.append(a)
+            self._index["areas"] = areas
+            self._dirty_access.clear()
+            self._publish_snapshot()
         p = self._index_path()
-        with open(p, "w") as f:
-            json.dump(self._index, f, indent=2)
+        # Compact (not pretty-printed) output: roughly halves the file size
+        if orjson is not None:
+            p.write_bytes(orjson.dumps(self._index))
+        else:
+            with open(p, "w") as f:
+                json.dump(self._index, f, separators=(",", ":"))
         self._index_mtime = p.stat().st_mtime
 
+    def flush_access_times(self):
+        """Persist buffered last_accessed timestamps, if any."""
+        with self._lock:
+            self._flush_timer = None
+            if self._dirty_access:
+                # Merge into the on-disk index, not a possibly stale copy:
+                # another manager may have changed it since our last read.
+                # Ids it has removed are simply not written back.
+                self._ensure_fresh()
+                self._save_index()
+
     def _ensure_fresh(self):
         """Reload the index when the file has been modified externally."""
         p = self._index_path()
         if p.exists() and p.stat().st_mtime > self._index_mtime:
             self._index = self._load_index()
+            self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        """Rebuild the read view (areas, id map, STRtree, bbox array) and swap it in.
+
+        Bboxes are kept as an (N, 4) float64 array so predicates over the
+        tree candidates are evaluated in one vectorized pass.
+
+        Must be called (under the lock) whenever ``_index["areas"]`` changes.
+        Readers never take the lock: they grab ``self._snapshot`` once and
+        work on that consistent view while writers publish a new one.
+        """
+        areas = tuple(self._index["areas"])
+        bbox_arr = np.array(
+            [a["bbox"] for a in areas], dtype=np.float64
+        ).reshape(-1, 4)
+        tree = shapely.STRtree(shapely.box(
+            bbox_arr[:, 0], bbox_arr[:, 1], bbox_arr[:, 2], bbox_arr[:, 3]
+        ))
+        by_id = {a["id"]: a for a in areas}
+        self._snapshot = _IndexSnapshot(areas, by_id, tree, bbox_arr)
+
+    def _read_snapshot(self) -> _IndexSnapshot:
+        """Return the current read view, reloading first if the file changed."""
+        p = self._index_path()
+        if p.exists() and p.stat().st_mtime > self._index_mtime:
+            with self._lock:
+                self._ensure_fresh()
+        return self._snapshot
 
     # -- Read operations -------------------------------------------------------
 
-    def get_cached_areas(self) -> List[dict]:
-        with self._lock:
-            self._ensure_fresh()
-            return list(self._index["areas"])
+    def get_cached_areas(self) -> Tuple[dict, ...]:
+        """All cached areas, as the snapshot's read-only tuple (not a copy)."""
+        return self._read_snapshot().areas
 
     def get_stats(self) -> dict:
         areas = self.get_cached_areas()
@@ -124,51 +370,112 @@ class CacheManager:
     ) -> Optional[dict]:
         """Return a cached area that fully covers *bbox*, or None."""
         min_lon, min_lat, max_lon, max_lat = bbox
-        with self._lock:
-            self._ensure_fresh()
-            areas = list(self._index["areas"])
-        for a in areas:
-            ab = a["bbox"]
-            if (ab[0] <= min_lon and ab[1] <= min_lat
-                    and ab[2] >= max_lon and ab[3] >= max_lat):
-                return a
-        return None
+        snap = self._read_snapshot()
+        cand = np.sort(snap.tree.query(shapely.box(*bbox)))
+        ab = snap.bbox_arr[cand]
+        covers = cand[
+            (ab[:, 0] <= min_lon) & (ab[:, 1] <= min_lat)
+            & (ab[:, 2] >= max_lon) & (ab[:, 3] >= max_lat)
+        ]
+        return snap.areas[covers[0]] if len(covers) else None
 
     def find_overlapping(
         self, bbox: Tuple[float, float, float, float]
     ) -> List[dict]:
         """Return cached areas that overlap with *bbox*."""
-        min_lon, min_lat, max_lon, max_lat = bbox
-        result = []
-        with self._lock:
-            self._ensure_fresh()
-            areas = list(self._index["areas"])
-        for a in areas:
-            ab = a["bbox"]
-            if not (ab[2] < min_lon or ab[0] > max_lon
-                    or ab[3] < min_lat or ab[1] > max_lat):
-                result.append(a)
-        return result
-
-    def load_geodataframe(self, area_id: str) -> Optional[gpd.GeoDataFrame]:
-        """Load a cached area as a GeoDataFrame."""
-        with self._lock:
-            self._ensure_fresh()
-            target = None
-            for a in self._index["areas"]:
-                if a["id"] == area_id:
-                    target = a
-                    break
+        snap = self._read_snapshot()
+        return [snap.areas[i] for i in np.sort(snap.tree.query(shapely.box(*bbox)))]
+
+    def load_geodataframe(
+        self,
+        area_id: str,
+        columns: Optional[List[str]] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Load a cached area as a GeoDataFrame.
+
+        *columns* limits the Parquet read to those columns (must include
+        ``geometry``); by default every stored column is loaded.  *bbox*
+        returns only buildings whose bounds intersect it.
+
+        Recently loaded areas are served from an in-memory LRU, so the
+        returned frame is shared and must be treated as read-only.  Areas
+        too large for the LRU are read with bbox pushdown instead, so only
+        the row groups overlapping *bbox* are decoded.
+        """
+        geom = shapely.box(*bbox) if bbox is not None else None
+        return self._load(area_id, columns, geom, None)
+
+    def query_area(
+        self,
+        area_id: str,
+        geom: shapely.Geometry,
+        columns: Optional[List[str]] = None,
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Buildings of a cached area that intersect *geom* (exact test).
+
+        For areas held in the LRU this queries the STRtree kept on the
+        in-memory frame, so repeated queries against the same area don't
+        rebuild it.  Same read-only and *columns* rules as load_geodataframe.
+        """
+        return self._load(area_id, columns, geom, "intersects")
+
+    def _load(
+        self,
+        area_id: str,
+        columns: Optional[List[str]],
+        geom: Optional[shapely.Geometry],
+        predicate: Optional[str],
+    ) -> Optional[gpd.GeoDataFrame]:
+        """Shared body of load_geodataframe / query_area (see _select)."""
+        target = self._read_snapshot().by_id.get(area_id)
         if target is None:
             return None
         fp = self.cache_dir / target["file_path"]
-        if not fp.exists():
-            return None
-        gdf = gpd.read_parquet(str(fp))
-        # Update last-accessed timestamp
+        resident = target.get("building_count", 0) <= GDF_CACHE_MAX_BUILDINGS
+        if geom is not None and not resident:
+            if not fp.exists():
+                return None
+            if _has_bbox_covering(fp):
+                # Pushdown already keeps exactly the rows whose bounds overlap
+                gdf = gpd.read_parquet(str(fp), columns=columns, bbox=geom.bounds)
+                if predicate is not None:
+                    gdf = _select(gdf, geom, predicate)
+            else:  # written before the bbox covering column was stored
+                gdf = gpd.read_parquet(str(fp), columns=columns)
+                gdf = _select(gdf, geom, predicate)
+        else:
+            key = (area_id, tuple(columns) if columns is not None else None)
+            with self._gdf_lock:
+                gdf = self._gdf_cache.get(key)
+                if gdf is not None:
+                    self._gdf_cache.move_to_end(key)
+            if gdf is None:
+                if not fp.exists():
+                    return None
+                gdf = gpd.read_parquet(str(fp), columns=columns)
+                if resident:
+                    with self._gdf_lock:
+                        old = self._gdf_cache.pop(key, None)
+                        if old is not None:  # loaded concurrently by another reader
+                            self._gdf_cached_rows -= len(old)
+                        self._gdf_cache[key] = gdf
+                        self._gdf_cached_rows += len(gdf)
+                        while self._gdf_cached_rows > GDF_CACHE_MAX_BUILDINGS:
+                            _, evicted = self._gdf_cache.popitem(last=False)
+                            self._gdf_cached_rows -= len(evicted)
+            if geom is not None:
+                gdf = _select(gdf, geom, predicate)
+        # Record the access; the index is rewritten by the deferred flush
+        # rather than once per read.
         with self._lock:
-            target["last_accessed"] = datetime.now(timezone.utc).isoformat()
-            self._save_index()
+            self._dirty_access[area_id] = time.time()
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(
+                    ACCESS_FLUSH_INTERVAL_SECONDS, self.flush_access_times
+                )
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
         return gdf
 
     # -- Write operations ------------------------------------------------------
@@ -206,62 +513,59 @@ class CacheManager:
 
         _progress(2, "Connecting to Overture Maps…")
 
-        # -- Stream record batches for progress reporting ----------------------
-        reader = overturemaps.record_batch_reader("building", bbox)
-        schema: Optional[pa.Schema] = None
-        batches: list[pa.RecordBatch] = []
+        # -- Stream record batches straight to disk ---------------------------
+        # Only one write chunk is resident at a time; batches are coalesced up
+        # to _WRITE_CHUNK_ROWS so the file does not end up with tiny row groups.
+        reader = _iter_building_batches(bbox)
+        writer: Optional[pq.ParquetWriter] = None
+        keep_cols: List[str] = []
+        pending: List[pa.RecordBatch] = []
+        pending_rows = 0
         total_rows = 0
         expected = max(est["estimated_buildings"], 500)
 
         _progress(5, "Downloading building data…")
 
-        for batch in reader:
-            if schema is None:
-                schema = batch.schema
-            batches.append(batch)
-            total_rows += batch.num_rows
-            pct = min(5 + int(65 * total_rows / expected), 70)
-            _progress(pct, f"Downloaded {total_rows:,} buildings…")
-
-        if not batches or total_rows == 0:
+        try:
+            for batch in reader:
+                if writer is None:
+                    if "geometry" not in batch.schema.names:
+                        _progress(100, "No geometry column — cannot cache.")
+                        return None
+                    keep_cols = [c for c in _KEEP_COLUMNS if c in batch.schema.names]
+                    schema = batch.select(keep_cols).schema.with_metadata(
+                        {b"geo": _GEO_METADATA}
+                    )
+                    writer = pq.ParquetWriter(
+                        str(full_path), schema, compression="snappy"
+                    )
+                pending.append(batch.select(keep_cols))
+                pending_rows += batch.num_rows
+                total_rows += batch.num_rows
+                if pending_rows >= _WRITE_CHUNK_ROWS:
+                    writer.write_table(pa.Table.from_batches(pending))
+                    pending, pending_rows = [], 0
+                pct = min(5 + int(80 * total_rows / expected), 85)
+                _progress(pct, f"Downloaded {total_rows:,} buildings…")
+
+            if writer is not None:
+                _progress(87, "Saving to disk…")
+                if pending:
+                    writer.write_table(pa.Table.from_batches(pending))
+                writer.close()
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            full_path.unlink(missing_ok=True)
+            raise
+
+        if total_rows == 0:
+            full_path.unlink(missing_ok=True)
             _progress(100, "No buildings found in this area.")
             return None
 
-        _progress(72, f"Merging {total_rows:,} records…")
-        assert schema is not None
-        table = pa.Table.from_batches(batches, schema=schema)
-
-        # Drop problematic nested columns
-        keep_cols = [c for c in table.column_names if c not in _DROP_COLUMNS]
-        table = table.select(keep_cols)
-
-        _progress(75, "Converting geometry…")
-        df = table.to_pandas()
-
-        if "geometry" not in df.columns:
-            _progress(100, "No geometry column — cannot cache.")
-            return None
-
-        from shapely import wkb as _wkb
-
-        if len(df) > 0 and isinstance(df["geometry"].iloc[0], bytes):
-            df["geometry"] = df["geometry"].apply(
-                lambda g: _wkb.loads(g) if g else None
-            )
-
-        gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
-
-        _progress(85, "Saving to disk…")
-        gdf.to_parquet(str(full_path))
         file_size = full_path.stat().st_size
 
-        # Compute area
-        min_lon, min_lat, max_lon, max_lat = bbox
-        c_lat = (min_lat + max_lat) / 2
-        lat_km = (max_lat - min_lat) * 111.32
-        lon_km = (max_lon - min_lon) * 111.32 * math.cos(math.radians(c_lat))
-        area_km2 = abs(lat_km * lon_km)
-
         now = datetime.now(timezone.utc).isoformat()
         area_entry = {
             "id": area_id,
@@ -270,8 +574,8 @@ class CacheManager:
             "center_lat": center_lat,
             "center_lon": center_lon,
             "radius_km": radius_km,
-            "area_km2": round(area_km2, 2),
-            "building_count": len(gdf),
+            "area_km2": est["area_km2"],
+            "building_count": total_rows,
             "file_size_bytes": file_size,
             "file_path": file_name,
             "created_at": now,
@@ -279,36 +583,49 @@ class CacheManager:
         }
 
         with self._lock:
+            self._ensure_fresh()
             self._index["areas"].append(area_entry)
+            self._publish_snapshot()
             self._save_index()
 
         _progress(
             100,
-            f"Cached {len(gdf):,} buildings "
+            f"Cached {total_rows:,} buildings "
             f"({file_size / (1024 * 1024):.1f} MB)",
         )
         return area_entry
 
     def delete_area(self, area_id: str) -> bool:
         with self._lock:
-            for i, a in enumerate(self._index["areas"]):
-                if a["id"] == area_id:
-                    fp = self.cache_dir / a["file_path"]
-                    if fp.exists():
-                        fp.unlink()
-                    self._index["areas"].pop(i)
-                    self._save_index()
-                    return True
-        return False
+            self._ensure_fresh()
+            target = self._snapshot.by_id.get(area_id)
+            if target is None:
+                return False
+            fp = self.cache_dir / target["file_path"]
+            if fp.exists():
+                fp.unlink()
+            self._index["areas"] = [
+                a for a in self._index["areas"] if a is not target
+            ]
+            self._publish_snapshot()
+            self._save_index()
+        with self._gdf_lock:
+            for key in [k for k in self._gdf_cache if k[0] == area_id]:
+                self._gdf_cached_rows -= len(self._gdf_cache.pop(key))
+        return True
 
     def clear_all(self) -> int:
         """Delete every cached area. Returns count of areas removed."""
         with self._lock:
-            count = len(self._index["areas"])
-            for a in self._index["areas"]:
-                fp = self.cache_dir / a["file_path"]
-                if fp.exists():
-                    fp.unlink()
+            self._ensure_fresh()
+            paths = [self.cache_dir / a["file_path"] for a in self._index["areas"]]
+            # Unlinks are independent syscalls; issue them concurrently
+            with ThreadPoolExecutor(max_workers=_UNLINK_WORKERS) as ex:
+                list(ex.map(lambda fp: fp.unlink(missing_ok=True), paths))
             self._index["areas"] = []
+            self._publish_snapshot()
             self._save_index()
-        return count
+            with self._gdf_lock:
+                self._gdf_cache.clear()
+                self._gdf_cached_rows = 0
+        return len(paths)
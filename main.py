@@ -6,10 +6,12 @@ import asyncio
 import io
 import json
 import os
+import threading
+import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.responses import HTMLResponse, StreamingResponse
@@ -28,6 +30,26 @@ from visualization import (
 # Thread pool for running blocking operations concurrently
 executor = ThreadPoolExecutor(max_workers=8)
 
+_PNG_CHUNK_BYTES = 64 * 1024
+
+
+def _encode_png(img) -> io.BytesIO:
+    """Encode *img* as PNG at zlib level 1.
+
+    Satellite imagery barely shrinks at higher levels, which cost several
+    times the CPU.
+    """
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    buf.seek(0)
+    return buf
+
+
+def _iter_chunks(buf: io.BytesIO):
+    """Yield *buf* in fixed-size chunks for StreamingResponse."""
+    while chunk := buf.read(_PNG_CHUNK_BYTES):
+        yield chunk
+
 
 app = FastAPI(
     title="House Counter API",
@@ -108,7 +130,8 @@ async def get_map_image(
     lat: float = Query(..., description="Latitude of center point", ge=-90, le=90),
     lon: float = Query(..., description="Longitude of center point", ge=-180, le=180),
     radius_km: float = Query(1.0, description="Search radius in kilometers", gt=0, le=10),
-    zoom: Optional[int] = Query(None, description="Zoom level (14-18). Higher = more detail but slower", ge=10, le=18)
+    zoom: Optional[int] = Query(None, description="Zoom level (14-18). Higher = more detail but slower", ge=10, le=18),
+    palette: bool = Query(False, description="Return a 256-colour PNG (much smaller, slight colour banding)")
 ):
     """
     Get a map image showing buildings within the search radius.
@@ -136,16 +159,17 @@ async def get_map_image(
             executor, get_building_polygons_ms, lat, lon, radius_meters
         )
         img = await loop.run_in_executor(
-            executor, lambda: create_map_image(lat, lon, radius_meters, buildings, zoom=zoom)
+            executor, lambda: create_map_image(
+                lat, lon, radius_meters, buildings, zoom=zoom,
+                output_mode="palette" if palette else "rgb"
+            )
         )
+        # Encode off the event loop; large maps take seconds to compress
+        img_bytes = await loop.run_in_executor(executor, _encode_png, img)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating map: {str(e)}")
     
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format="PNG")
-    img_bytes.seek(0)
-    
-    return StreamingResponse(img_bytes, media_type="image/png")
+    return StreamingResponse(_iter_chunks(img_bytes), media_type="image/png")
 
 
 @app.get("/zoom-info")
@@ -213,11 +237,11 @@ async def count_with_map(
             executor, query_ms_buildings_in_radius, lat, lon, radius_meters
         )
         buildings_polygons = await loop.run_in_executor(
-            executor, get_building_polygons_ms, lat, lon, radius_meters
+            executor, get_building_polygons_ms, lat, lon, radius_meters, buildings
         )
         building_count = len(buildings)
-        total_area = sum(b.area_sqm for b in buildings)
-        avg_area = total_area / len(buildings) if buildings else 0
+        total_area = buildings.area_sqm_total
+        avg_area = total_area / building_count if building_count else 0
         
         img = await loop.run_in_executor(
             executor, lambda: create_map_image(lat, lon, radius_meters, buildings_polygons, zoom=zoom)
@@ -291,7 +315,7 @@ async def compare_data_sources(
     try:
         ms_buildings, _ = await ms_task
         ms_count = len(ms_buildings)
-        ms_total_area = sum(b.area_sqm for b in ms_buildings)
+        ms_total_area = ms_buildings.area_sqm_total
     except Exception as e:
         ms_error = str(e)
     
@@ -358,7 +382,7 @@ async def compare_with_map(
             executor, query_ms_buildings_in_radius, lat, lon, radius_meters
         )
         polygons = await loop.run_in_executor(
-            executor, get_building_polygons_ms, lat, lon, radius_meters
+            executor, get_building_polygons_ms, lat, lon, radius_meters, buildings
         )
         return buildings, polygons
     
@@ -421,8 +445,42 @@ async def compare_with_map(
 
 _cache_mgr = get_cache_manager()
 
-# In-flight task progress – written by worker threads, polled by SSE
+# Caching jobs get their own small pool so long downloads can't starve the
+# request executor; beyond _CACHE_MAX_PENDING jobs /cache/start answers 429.
+_CACHE_WORKERS = 2
+_CACHE_MAX_PENDING = 8  # running + queued
+_cache_executor = ThreadPoolExecutor(
+    max_workers=_CACHE_WORKERS, thread_name_prefix="cache-"
+)
+_cache_pending = 0
+_cache_pending_lock = threading.Lock()
+
+# In-flight task progress – latest state per task, written by worker threads
 _task_progress: Dict[str, dict] = {}
+# SSE listeners per task; every state change is pushed onto each queue
+_task_listeners: Dict[str, Set[asyncio.Queue]] = {}
+# When each task reached a terminal state (monotonic seconds); event loop only
+_task_finished_at: Dict[str, float] = {}
+
+_TERMINAL_STATUSES = ("complete", "error")
+_SSE_HEARTBEAT_SECONDS = 30  # keepalive comment so proxies don't drop idle streams
+_TASK_TTL_SECONDS = 300  # finished tasks stay visible to late joiners this long
+
+
+def _fanout_progress(task_id: str, state: dict):
+    """Deliver *state* to the task's SSE listeners (runs on the event loop)."""
+    if state["status"] in _TERMINAL_STATUSES:
+        _task_finished_at[task_id] = time.monotonic()
+    for q in _task_listeners.get(task_id, ()):
+        q.put_nowait(state)
+
+
+def _evict_finished_tasks():
+    """Drop tasks that finished more than _TASK_TTL_SECONDS ago."""
+    cutoff = time.monotonic() - _TASK_TTL_SECONDS
+    for task_id in [t for t, ts in _task_finished_at.items() if ts < cutoff]:
+        del _task_finished_at[task_id]
+        _task_progress.pop(task_id, None)
 
 
 class CacheEstimateRequest(BaseModel):
@@ -468,6 +526,7 @@ async def estimate_cache(request: CacheEstimateRequest):
 @app.post("/cache/start")
 async def start_cache(request: CacheStartRequest):
     """Start an async caching task. Returns a task_id for progress polling."""
+    global _cache_pending
     bbox = tuple(request.bbox)
 
     # Quick validation
@@ -478,20 +537,30 @@ async def start_cache(request: CacheStartRequest):
             f"Area too large ({est['area_km2']:.0f} km²). Maximum is 10,000 km².",
         )
 
+    _evict_finished_tasks()
     task_id = uuid.uuid4().hex[:12]
-    _task_progress[task_id] = {
-        "status": "queued",
-        "progress": 0,
-        "message": "Queued…",
-    }
+    loop = asyncio.get_running_loop()
+
+    def _set_progress(state: dict):
+        # Called from the worker thread; listeners live on the event loop
+        _task_progress[task_id] = state
+        loop.call_soon_threadsafe(_fanout_progress, task_id, state)
 
     def _run():
+        global _cache_pending
+        try:
+            _cache_job()
+        finally:
+            with _cache_pending_lock:
+                _cache_pending -= 1
+
+    def _cache_job():
         def progress_cb(pct: int, msg: str):
-            _task_progress[task_id] = {
+            _set_progress({
                 "status": "running",
                 "progress": pct,
                 "message": msg,
-            }
+            })
 
         try:
             result = _cache_mgr.cache_area(
@@ -503,7 +572,7 @@ async def start_cache(request: CacheStartRequest):
                 progress_cb=progress_cb,
             )
             if result:
-                _task_progress[task_id] = {
+                _set_progress({
                     "status": "complete",
                     "progress": 100,
                     "message": (
@@ -511,44 +580,85 @@ async def start_cache(request: CacheStartRequest):
                         f"({result['file_size_bytes'] / (1024*1024):.1f} MB)"
                     ),
                     "area": result,
-                }
+                })
             else:
-                _task_progress[task_id] = {
+                _set_progress({
                     "status": "complete",
                     "progress": 100,
                     "message": "No buildings found in this area.",
                     "area": None,
-                }
+                })
         except Exception as e:
-            _task_progress[task_id] = {
+            _set_progress({
                 "status": "error",
                 "progress": 0,
                 "message": str(e),
-            }
+            })
 
-    executor.submit(_run)
+    with _cache_pending_lock:
+        if _cache_pending >= _CACHE_MAX_PENDING:
+            raise HTTPException(429, "Too many caching jobs queued. Try again later.")
+        _cache_pending += 1
+
+    # From here the slot is released by _run; if the job never gets that far
+    # (e.g. submit after executor shutdown), release it here instead
+    try:
+        _task_progress[task_id] = {
+            "status": "queued",
+            "progress": 0,
+            "message": "Queued…",
+        }
+        _cache_executor.submit(_run)
+    except BaseException:
+        _task_progress.pop(task_id, None)
+        with _cache_pending_lock:
+            _cache_pending -= 1
+        raise
     return {"task_id": task_id}
 
 
 @app.get("/cache/progress/{task_id}")
 async def cache_progress(task_id: str):
     """SSE endpoint streaming progress updates for a caching task."""
-    if task_id not in _task_progress:
+    # Captured now: the task may be evicted before the stream first runs
+    initial = _task_progress.get(task_id)
+    if initial is None:
         raise HTTPException(404, "Task not found")
 
     async def event_stream():
-        last_sent = None
-        deadline = asyncio.get_event_loop().time() + 600  # 10 min timeout
-        while asyncio.get_event_loop().time() < deadline:
-            current = _task_progress.get(task_id)
-            if current and current != last_sent:
-                yield f"data: {json.dumps(current)}\n\n"
-                last_sent = current.copy()
-                if current.get("status") in ("complete", "error"):
-                    # Keep entry for 30 s so late pollers can see it
-                    await asyncio.sleep(1)
-                    break
-            await asyncio.sleep(0.4)
+        q: asyncio.Queue = asyncio.Queue()
+        listeners = _task_listeners.setdefault(task_id, set())
+        listeners.add(q)
+        try:
+            # Start from the latest state, then wait for pushed updates
+            state, last_sent = _task_progress.get(task_id), None
+            if state is None:
+                # Finished and evicted since the request arrived; its final
+                # update may never reach this listener, so end the stream
+                if initial["status"] in _TERMINAL_STATUSES:
+                    state = initial
+                else:
+                    state = {"status": "error", "progress": 0, "message": "Task not found"}
+            while True:
+                if state is not last_sent:
+                    yield f"data: {json.dumps(state)}\n\n"
+                    last_sent = state
+                    if state["status"] in _TERMINAL_STATUSES:
+                        break
+                try:
+                    queued = await asyncio.wait_for(q.get(), _SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                # The queue is only a wake-up: the worker stores each state
+                # before its fanout runs, so queued states can be older than
+                # one already sent. Always send the latest, so progress never
+                # goes backwards (repeats are skipped by the identity check).
+                state = _task_progress.get(task_id, queued)
+        finally:
+            listeners.discard(q)
+            if not listeners:
+                _task_listeners.pop(task_id, None)
 
     return StreamingResponse(
         event_stream(),
@@ -5,24 +5,60 @@ Uses the official overturemaps library for optimized access.
 No API key required - data is publicly accessible.
 """
 import math
+import os
+import threading
 import time
-from typing import Dict, List, Tuple
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
 from shapely.geometry import Point
 from shapely.ops import transform
 import pyproj
 
 import overturemaps
 
+from cache_manager import get_cache_manager
+
 
 # ---------------------------------------------------------------------------
 # Cache for Overture Maps query results (avoids repeated S3 round-trips)
 # ---------------------------------------------------------------------------
-_query_cache: Dict[tuple, Tuple[gpd.GeoDataFrame, float]] = {}
+@dataclass
+class _CacheEntry:
+    gdf: gpd.GeoDataFrame
+    created: float
+    # Derived from gdf on first use by the public APIs, then reused
+    buildings: Optional["BuildingSet"] = None
+    total_area: Optional[float] = None
+
+
+# LRU order: most recently used last
+_query_cache: "OrderedDict[tuple, _CacheEntry]" = OrderedDict()
+_query_cache_lock = threading.Lock()
 _CACHE_MAX_SIZE = 50
 _CACHE_TTL_SECONDS = 300  # 5 minutes
 
+# Columns kept from Overture / the disk cache; everything else is dropped
+_QUERY_COLUMNS = ["id", "geometry"]
+
+# shapely.get_type_id codes
+_POLYGON = 3
+_MULTIPOLYGON = 6
+
+# WKB arrays at least this long are decoded in parallel chunks
+_WKB_PARALLEL_MIN_ROWS = 50_000
+_WKB_WORKERS = os.cpu_count() or 1
+_wkb_pool: Optional[ThreadPoolExecutor] = None  # created on first large decode
+_wkb_pool_lock = threading.Lock()
+
 
 @dataclass
 class Building:
@@ -34,6 +70,36 @@ class Building:
     geometry: any  # Shapely polygon
 
 
+@dataclass
+class BuildingSet:
+    """Buildings from one query, stored column-wise (one array per field).
+
+    Aggregates run on the arrays directly; iterating yields a Building per
+    row for callers that want objects.
+    """
+    ids: np.ndarray  # int64
+    lats: np.ndarray  # centroid latitude
+    lons: np.ndarray  # centroid longitude
+    areas: np.ndarray  # square metres
+    geoms: np.ndarray  # shapely geometries, WGS84
+
+    @classmethod
+    def empty(cls) -> "BuildingSet":
+        return cls(*(np.empty(0) for _ in range(5)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Building]:
+        for row in zip(self.ids.tolist(), self.lats.tolist(), self.lons.tolist(),
+                       self.areas.tolist(), self.geoms):
+            yield Building(*row)
+
+    @property
+    def area_sqm_total(self) -> float:
+        return float(self.areas.sum())
+
+
 def get_bounding_box(lat: float, lon: float, radius_meters: float) -> Tuple[float, float, float, float]:
     """
     Calculate bounding box from center point and radius.
@@ -41,18 +107,19 @@ def get_bounding_box(lat: float, lon: float, radius_meters: float) -> Tuple[floa
     """
     R = 6371000  # Earth's radius in meters
     angular_distance = radius_meters / R
-
     lat_rad = math.radians(lat)
-    lon_rad = math.radians(lon)
 
-    min_lat = math.degrees(lat_rad - angular_distance)
-    max_lat = math.degrees(lat_rad + angular_distance)
+    delta_lat = math.degrees(angular_distance)
+    if abs(lat) <= 85:
+        # Flat-earth approximation: for radii of a few km it differs from
+        # the spherical formula below by well under a metre
+        delta_lon = math.degrees(angular_distance / math.cos(lat_rad))
+    else:
+        delta_lon = math.degrees(
+            math.asin(min(1.0, math.sin(angular_distance) / math.cos(lat_rad)))
+        )
 
-    delta_lon = math.asin(math.sin(angular_distance) / math.cos(lat_rad))
-    min_lon = math.degrees(lon_rad - delta_lon)
-    max_lon = math.degrees(lon_rad + delta_lon)
-
-    return (min_lon, min_lat, max_lon, max_lat)
+    return (lon - delta_lon, lat - delta_lat, lon + delta_lon, lat + delta_lat)
 
 
 # ---------------------------------------------------------------------------
@@ -64,10 +131,125 @@ def _get_cache_key(lat: float, lon: float, radius_meters: float) -> tuple:
     return (round(lat, 6), round(lon, 6), round(radius_meters, 1))
 
 
+# EPSG codes for UTM zones 1-60, indexed by zone - 1
+_UTM_NORTH = tuple(f"EPSG:{32600 + zone}" for zone in range(1, 61))
+_UTM_SOUTH = tuple(f"EPSG:{32700 + zone}" for zone in range(1, 61))
+
+
 def _get_utm_crs(lat: float, lon: float) -> str:
     """Return the UTM CRS string for the given lat/lon."""
-    utm_zone = int((lon + 180) / 6) + 1
-    return f"EPSG:{32600 + utm_zone}" if lat >= 0 else f"EPSG:{32700 + utm_zone}"
+    zone_idx = min(int((lon + 180) // 6), 59)  # lon == 180 belongs to zone 60
+    return _UTM_NORTH[zone_idx] if lat >= 0 else _UTM_SOUTH[zone_idx]
+
+
+@lru_cache(maxsize=64)
+def _utm_transformers(utm_crs: str) -> Tuple[Callable, Callable]:
+    """(WGS84 -> utm_crs, utm_crs -> WGS84) transform functions, built once per zone."""
+    to_utm = pyproj.Transformer.from_crs('EPSG:4326', utm_crs, always_xy=True).transform
+    to_wgs = pyproj.Transformer.from_crs(utm_crs, 'EPSG:4326', always_xy=True).transform
+    return to_utm, to_wgs
+
+
+@lru_cache(maxsize=128)
+def _search_circle(lat: float, lon: float, radius_meters: float):
+    """WGS84 polygon of the *radius_meters* circle around (lat, lon).
+
+    Buffered in UTM so the radius is metric.  Called with the rounded
+    values from _get_cache_key, so repeat queries reuse the polygon
+    (shapely geometries are immutable, so sharing is safe).
+    """
+    project_to_utm, project_to_wgs = _utm_transformers(_get_utm_crs(lat, lon))
+    center_utm = transform(project_to_utm, Point(lon, lat))
+    return transform(project_to_wgs, center_utm.buffer(radius_meters))
+
+
+def _decode_wkb(values: np.ndarray) -> np.ndarray:
+    """Vectorized WKB -> shapely decode (None stays None).
+
+    GEOS releases the GIL while parsing, so large inputs are split across
+    threads for near-linear scaling on multi-core hosts.
+    """
+    global _wkb_pool
+    if len(values) < _WKB_PARALLEL_MIN_ROWS or _WKB_WORKERS == 1:
+        return shapely.from_wkb(values)
+    if _wkb_pool is None:
+        with _wkb_pool_lock:
+            if _wkb_pool is None:
+                _wkb_pool = ThreadPoolExecutor(max_workers=_WKB_WORKERS, thread_name_prefix="wkb-")
+    parts = _wkb_pool.map(shapely.from_wkb, np.array_split(values, _WKB_WORKERS))
+    return np.concatenate(list(parts))
+
+
+def _utm_total_area(geoms: np.ndarray, lat: float, lon: float) -> float:
+    """Summed UTM area (m²) of polygonal *geoms*, without building UTM geometries.
+
+    Coordinates are pulled out as one ragged array, projected in bulk and
+    fed to the shoelace formula per ring (holes subtract).  They are taken
+    relative to the query centre so the cross products stay small and
+    precise.  Non-polygonal input falls back to a full to_crs.
+    """
+    utm_crs = _get_utm_crs(lat, lon)
+    try:
+        _, coords, offsets = shapely.to_ragged_array(geoms)
+    except ValueError:  # not all Polygon / MultiPolygon
+        return float(gpd.GeoSeries(geoms, crs='EPSG:4326').to_crs(utm_crs).area.sum())
+    ring_offsets, poly_offsets = offsets[0], offsets[1]
+    if len(ring_offsets) < 2:
+        return 0.0
+
+    to_utm, _ = _utm_transformers(utm_crs)
+    x0, y0 = to_utm(lon, lat)
+    x, y = to_utm(coords[:, 0], coords[:, 1])
+    x, y = x - x0, y - y0
+
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    cross[ring_offsets[1:-1] - 1] = 0.0  # pairs spanning two rings
+    ring_area = np.abs(np.add.reduceat(cross, ring_offsets[:-1])) / 2
+
+    sign = np.full(len(ring_area), -1.0)
+    sign[poly_offsets[:-1][np.diff(poly_offsets) > 0]] = 1.0  # exteriors
+    return float((sign * ring_area).sum())
+
+
+def _within_circle(gdf: gpd.GeoDataFrame, circle) -> gpd.GeoDataFrame:
+    """Rows of *gdf* intersecting *circle*, in their original order.
+
+    The STRtree prunes by bounding box first, so the exact intersects test
+    only runs on buildings near the circle.
+    """
+    idx = gdf.sindex.query(circle, predicate="intersects")
+    return gdf.iloc[np.sort(idx)]
+
+
+def _cache_get(cache_key: tuple) -> Optional[gpd.GeoDataFrame]:
+    """Cached result for *cache_key*, or None if missing or expired."""
+    with _query_cache_lock:
+        hit = _query_cache.get(cache_key)
+        if hit is None:
+            return None
+        if time.time() - hit.created >= _CACHE_TTL_SECONDS:
+            del _query_cache[cache_key]
+            return None
+        _query_cache.move_to_end(cache_key)
+        return hit.gdf
+
+
+def _cache_put(cache_key: tuple, gdf: gpd.GeoDataFrame):
+    """Store *gdf*, evicting the least recently used entries past the limit."""
+    with _query_cache_lock:
+        _query_cache[cache_key] = _CacheEntry(gdf, time.time())
+        _query_cache.move_to_end(cache_key)
+        while len(_query_cache) > _CACHE_MAX_SIZE:
+            _query_cache.popitem(last=False)
+
+
+def _cache_entry(
+    lat: float, lon: float, radius_meters: float, gdf: gpd.GeoDataFrame
+) -> Optional[_CacheEntry]:
+    """The cache entry holding exactly *gdf*, for memoizing derived data."""
+    with _query_cache_lock:
+        entry = _query_cache.get(_get_cache_key(lat, lon, radius_meters))
+    return entry if entry is not None and entry.gdf is gdf else None
 
 
 def _fetch_and_filter_buildings(
@@ -83,52 +265,34 @@ def _fetch_and_filter_buildings(
     cache_key = _get_cache_key(lat, lon, radius_meters)
 
     # -- Check in-memory cache ------------------------------------------------
-    if cache_key in _query_cache:
-        cached_gdf, cached_time = _query_cache[cache_key]
-        if time.time() - cached_time < _CACHE_TTL_SECONDS:
-            print(f"Memory cache hit for ({lat}, {lon}, {radius_meters}m)")
-            return cached_gdf
-        del _query_cache[cache_key]
+    cached_gdf = _cache_get(cache_key)
+    if cached_gdf is not None:
+        print(f"Memory cache hit for ({lat}, {lon}, {radius_meters}m)")
+        return cached_gdf
+
+    # Both routes below clip to the UTM search circle, so both fetch by the
+    # circle's own bounds: get_bounding_box's spherical latitude span is
+    # slightly narrower and would drop buildings near the north/south edge
+    circle = _search_circle(*cache_key)
+    bbox = circle.bounds
 
     # -- Check persistent disk cache ------------------------------------------
-    bbox = get_bounding_box(lat, lon, radius_meters)
     try:
-        from cache_manager import get_cache_manager
         disk_mgr = get_cache_manager()
         covering = disk_mgr.find_covering_cache(bbox)
         if covering:
-            disk_gdf = disk_mgr.load_geodataframe(covering["id"])
-            if disk_gdf is not None and len(disk_gdf) > 0:
+            # Spatial filter: circular radius, run against the cached
+            # area's own spatial index
+            disk_gdf = disk_mgr.query_area(covering["id"], circle, columns=_QUERY_COLUMNS)
+            if disk_gdf is not None:
                 print(
                     f"Disk cache hit: '{covering['name']}' "
                     f"({covering['building_count']} buildings)"
                 )
-                # Spatial filter: bbox then circular radius
-                min_lon, min_lat, max_lon, max_lat = bbox
-                disk_gdf = disk_gdf.cx[min_lon:max_lon, min_lat:max_lat].copy()
-
-                center = Point(lon, lat)
-                utm_crs = _get_utm_crs(lat, lon)
-                proj_utm = pyproj.Transformer.from_crs(
-                    'EPSG:4326', utm_crs, always_xy=True
-                ).transform
-                proj_wgs = pyproj.Transformer.from_crs(
-                    utm_crs, 'EPSG:4326', always_xy=True
-                ).transform
-                center_utm = transform(proj_utm, center)
-                circle_utm = center_utm.buffer(radius_meters)
-                circle_wgs = transform(proj_wgs, circle_utm)
-                disk_gdf = disk_gdf[
-                    disk_gdf.geometry.intersects(circle_wgs)
-                ].copy()
-
                 print(f"Disk cache: {len(disk_gdf)} buildings within radius")
 
                 # Populate memory cache
-                if len(_query_cache) >= _CACHE_MAX_SIZE:
-                    oldest = min(_query_cache, key=lambda k: _query_cache[k][1])
-                    del _query_cache[oldest]
-                _query_cache[cache_key] = (disk_gdf, time.time())
+                _cache_put(cache_key, disk_gdf)
                 return disk_gdf
     except Exception as exc:
         print(f"Disk cache lookup failed (non-fatal): {exc}")
@@ -141,50 +305,49 @@ def _fetch_and_filter_buildings(
 
     try:
         bbox_tuple = (min_lon, min_lat, max_lon, max_lat)
-        gdf = overturemaps.record_batch_reader("building", bbox_tuple).read_all().to_pandas()
-        print(f"Query returned {len(gdf)} buildings from Overture Maps ({time.time() - t0:.1f}s)")
-
-        if len(gdf) == 0:
+        reader = overturemaps.record_batch_reader("building", bbox_tuple)
+        # Project each batch down as it streams in, so the nested Overture
+        # structs never accumulate into one full-width table
+        keep = [c for c in _QUERY_COLUMNS if c in reader.schema.names]
+        table = pa.Table.from_batches(
+            [batch.select(keep) for batch in reader],
+            schema=pa.schema([reader.schema.field(c) for c in keep]),
+        )
+        print(f"Query returned {table.num_rows} buildings from Overture Maps ({time.time() - t0:.1f}s)")
+
+        if table.num_rows == 0:
             empty = gpd.GeoDataFrame()
-            _query_cache[cache_key] = (empty, time.time())
+            _cache_put(cache_key, empty)
             return empty
 
-        if 'geometry' in gdf.columns:
-            from shapely import wkb
-            if isinstance(gdf['geometry'].iloc[0], bytes):
-                gdf['geometry'] = gdf['geometry'].apply(lambda x: wkb.loads(x) if x else None)
-            gdf = gpd.GeoDataFrame(gdf, geometry='geometry', crs='EPSG:4326')
+        if 'geometry' in table.column_names:
+            # Decode WKB straight from the Arrow column; the other columns
+            # stay Arrow-backed in pandas instead of being copied out
+            geoms = _decode_wkb(
+                table.column('geometry').to_numpy(zero_copy_only=False)
+            )
+            gdf = gpd.GeoDataFrame(
+                table.drop_columns(['geometry']).to_pandas(types_mapper=pd.ArrowDtype),
+                geometry=geoms,
+                crs='EPSG:4326',
+            )
         else:
             print("No geometry column found")
             empty = gpd.GeoDataFrame()
-            _query_cache[cache_key] = (empty, time.time())
+            _cache_put(cache_key, empty)
             return empty
 
     except Exception as e:
         print(f"Error querying Overture Maps: {e}")
-        import traceback
         traceback.print_exc()
         return gpd.GeoDataFrame()
 
     # -- Filter to circular radius -------------------------------------------
-    center = Point(lon, lat)
-    utm_crs = _get_utm_crs(lat, lon)
-
-    project_to_utm = pyproj.Transformer.from_crs('EPSG:4326', utm_crs, always_xy=True).transform
-    project_to_wgs = pyproj.Transformer.from_crs(utm_crs, 'EPSG:4326', always_xy=True).transform
-
-    center_utm = transform(project_to_utm, center)
-    search_circle_utm = center_utm.buffer(radius_meters)
-    search_circle = transform(project_to_wgs, search_circle_utm)
-
-    gdf = gdf[gdf.geometry.intersects(search_circle)].copy()
+    gdf = _within_circle(gdf, circle)
     print(f"Buildings within {radius_meters}m radius: {len(gdf)} ({time.time() - t0:.1f}s total)")
 
     # -- Cache the filtered result -------------------------------------------
-    if len(_query_cache) >= _CACHE_MAX_SIZE:
-        oldest_key = min(_query_cache, key=lambda k: _query_cache[k][1])
-        del _query_cache[oldest_key]
-    _query_cache[cache_key] = (gdf, time.time())
+    _cache_put(cache_key, gdf)
 
     return gdf
 
@@ -207,13 +370,17 @@ def count_buildings_in_radius(
     if len(gdf) == 0:
         return 0, 0.0, 0.0
 
-    # Vectorized area calculation via bulk CRS projection
-    utm_crs = _get_utm_crs(lat, lon)
-    gdf_utm = gdf.to_crs(utm_crs)
-    areas = gdf_utm.area
+    entry = _cache_entry(lat, lon, radius_meters, gdf)
+    if entry is not None and entry.buildings is not None:
+        total_area = entry.buildings.area_sqm_total
+    elif entry is not None and entry.total_area is not None:
+        total_area = entry.total_area
+    else:
+        total_area = _utm_total_area(gdf.geometry.to_numpy(), lat, lon)
+        if entry is not None:
+            entry.total_area = total_area
 
     count = len(gdf)
-    total_area = float(areas.sum())
     avg_area = total_area / count
 
     return count, round(total_area, 2), round(avg_area, 2)
@@ -223,35 +390,41 @@ def query_ms_buildings_in_radius(
     lat: float,
     lon: float,
     radius_meters: float
-) -> Tuple[List[Building], gpd.GeoDataFrame]:
+) -> Tuple[BuildingSet, gpd.GeoDataFrame]:
     """
-    Query building footprints and return Building objects + GeoDataFrame.
+    Query building footprints and return a BuildingSet + GeoDataFrame.
 
-    Uses vectorized CRS projection and cached queries for speed.
+    Uses vectorized CRS projection and cached queries for speed.  The
+    BuildingSet is memoized with the cached result, so treat it as
+    read-only.
     """
     gdf = _fetch_and_filter_buildings(lat, lon, radius_meters)
 
     if len(gdf) == 0:
-        return [], gpd.GeoDataFrame()
-
-    # Vectorized projection & area calculation (one bulk operation, not per-row)
-    utm_crs = _get_utm_crs(lat, lon)
-    gdf_utm = gdf.to_crs(utm_crs)
-    area_values = gdf_utm.area.values
-    centroids = gdf.geometry.centroid
-
-    buildings = []
-    for i, (idx, row) in enumerate(gdf.iterrows()):
-        try:
-            buildings.append(Building(
-                id=hash(str(row.get('id', idx))) % (10**9),
-                lat=centroids.iloc[i].y,
-                lon=centroids.iloc[i].x,
-                area_sqm=float(area_values[i]),
-                geometry=row.geometry
-            ))
-        except Exception:
-            continue
+        return BuildingSet.empty(), gpd.GeoDataFrame()
+
+    entry = _cache_entry(lat, lon, radius_meters, gdf)
+    if entry is not None and entry.buildings is not None:
+        return entry.buildings, gdf
+
+    # Vectorized projection, area and centroid (bulk operations, not per-row);
+    # centroids are taken in UTM, where they are planar-correct
+    geoms_utm = gdf.geometry.to_crs(_get_utm_crs(lat, lon))
+    area_values = geoms_utm.area.to_numpy()
+    centroids = geoms_utm.centroid.to_crs('EPSG:4326')
+    # Stable numeric ids: one vectorized hash of the Overture id strings
+    raw_ids = gdf['id'] if 'id' in gdf.columns else gdf.index
+    ids = pd.util.hash_array(raw_ids.astype(str).to_numpy()) % (10**9)
+
+    buildings = BuildingSet(
+        ids=ids.astype(np.int64),
+        lats=centroids.y.to_numpy(),
+        lons=centroids.x.to_numpy(),
+        areas=area_values,
+        geoms=gdf.geometry.to_numpy(),
+    )
+    if entry is not None:
+        entry.buildings = buildings
 
     return buildings, gdf
 
@@ -259,33 +432,51 @@ def query_ms_buildings_in_radius(
 def get_building_polygons_ms(
     lat: float,
     lon: float,
-    radius_meters: float
+    radius_meters: float,
+    buildings: Optional[BuildingSet] = None
 ) -> List[dict]:
     """
     Get building polygons for visualization.
     Returns list of dicts compatible with the visualization module.
+
+    Pass *buildings* (from query_ms_buildings_in_radius for the same
+    point and radius) to skip querying them again.
     """
-    buildings, gdf = query_ms_buildings_in_radius(lat, lon, radius_meters)
-
-    polygons = []
-    for building in buildings:
-        try:
-            if building.geometry.geom_type == 'Polygon':
-                coords = [(y, x) for x, y in building.geometry.exterior.coords]
-            elif building.geometry.geom_type == 'MultiPolygon':
-                largest = max(building.geometry.geoms, key=lambda g: g.area)
-                coords = [(y, x) for x, y in largest.exterior.coords]
-            else:
-                continue
-        except Exception:
-            continue
-
-        polygons.append({
-            "id": building.id,
-            "coordinates": coords,
+    if buildings is None:
+        buildings, _ = query_ms_buildings_in_radius(lat, lon, radius_meters)
+
+    # Exterior rings in one pass: Polygons as-is, MultiPolygons by their
+    # largest part (first one on ties); anything else is skipped
+    geoms = buildings.geoms
+    type_ids = shapely.get_type_id(geoms)
+    keep = np.flatnonzero(
+        (type_ids == _POLYGON) | ((type_ids == _MULTIPOLYGON) & ~shapely.is_empty(geoms))
+    )
+    shapes = geoms[keep]
+    multi = np.flatnonzero(type_ids[keep] == _MULTIPOLYGON)
+    if len(multi):
+        parts, owner = shapely.get_parts(shapes[multi], return_index=True)
+        order = np.lexsort((-shapely.area(parts), owner))
+        _, first = np.unique(owner[order], return_index=True)
+        shapes[multi] = parts[order[first]]
+    coords, owner = shapely.get_coordinates(
+        shapely.get_exterior_ring(shapes), return_index=True
+    )
+    bounds = np.cumsum(np.bincount(owner, minlength=len(shapes)))[:-1]
+    rings = np.split(coords[:, ::-1], bounds)  # (lat, lon) order
+
+    polygons = [
+        {
+            "id": building_id,
+            "coordinates": ring.tolist(),
             "type": "building",
-            "center": (building.lat, building.lon),
-            "area_sqm": building.area_sqm
-        })
+            "center": (c_lat, c_lon),
+            "area_sqm": area
+        }
+        for building_id, ring, c_lat, c_lon, area in zip(
+            buildings.ids[keep].tolist(), rings, buildings.lats[keep].tolist(),
+            buildings.lons[keep].tolist(), buildings.areas[keep].tolist()
+        )
+    ]
 
     return polygons
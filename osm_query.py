@@ -2,9 +2,20 @@
 OpenStreetMap Overpass API module for querying buildings.
 Used for comparison testing against Microsoft Building Footprints.
 """
-import requests
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List
+from typing import List, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
 
 
 @dataclass
@@ -23,24 +34,48 @@ OVERPASS_ENDPOINTS = [
     "https://overpass-api.de/api/interpreter",
 ]
 
+# Shared session: keeps TLS connections to the endpoints alive across calls
+_SESSION = requests.Session()
+_SESSION.headers["User-Agent"] = "HouseCounter/1.0"
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Recent Overpass responses keyed by query text (avoids repeat round-trips)
+_response_cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+_CACHE_MAX_SIZE = 32
+_CACHE_TTL_SECONDS = 300  # 5 minutes
+
 
 def _query_overpass(query: str) -> dict:
     """Try multiple Overpass endpoints with fallback."""
+    with _response_cache_lock:
+        hit = _response_cache.get(query)
+        if hit is not None and time.time() - hit[1] < _CACHE_TTL_SECONDS:
+            return hit[0]
+
     last_error = None
     for endpoint in OVERPASS_ENDPOINTS:
         try:
-            response = requests.post(
+            response = _SESSION.post(
                 endpoint, 
                 data={"data": query}, 
-                timeout=120,
-                headers={"User-Agent": "HouseCounter/1.0"}
+                timeout=120
             )
             response.raise_for_status()
-            return response.json()
+            data = orjson.loads(response.content) if orjson else response.json()
+            break
         except Exception as e:
             last_error = e
             continue
-    raise last_error or Exception("All Overpass endpoints failed")
+    else:
+        raise last_error or Exception("All Overpass endpoints failed")
+
+    with _response_cache_lock:
+        _response_cache[query] = (data, time.time())
+        _response_cache.move_to_end(query)
+        while len(_response_cache) > _CACHE_MAX_SIZE:
+            _response_cache.popitem(last=False)
+    return data
 
 
 def query_osm_buildings(
@@ -70,15 +105,14 @@ def query_osm_buildings(
     
     data = _query_overpass(query)
     
+    # Dedupe by id in a single pass; first occurrence wins, order is kept
+    unique = {}
+    for element in data.get("elements", []):
+        unique.setdefault(element.get("id"), element)
+
     buildings = []
-    seen_ids = set()
     
-    for element in data.get("elements", []):
-        element_id = element.get("id")
-        if element_id in seen_ids:
-            continue
-        seen_ids.add(element_id)
-        
+    for element_id, element in unique.items():
         # Get coordinates - for ways, use center
         if element.get("type") == "way":
             center = element.get("center", {})
@@ -125,27 +159,34 @@ def get_osm_building_polygons(
     
     data = _query_overpass(query)
     
+    ways = [
+        element for element in data.get("elements", [])
+        if element.get("type") == "way" and element.get("geometry")
+    ]
+    if not ways:
+        return []
+
+    # All vertices in one (N, 2) lat/lon array; centers are per-way means
+    lengths = np.fromiter(
+        (len(w["geometry"]) for w in ways), dtype=np.intp, count=len(ways)
+    )
+    flat = np.fromiter(
+        (v for w in ways for pt in w["geometry"] for v in (pt["lat"], pt["lon"])),
+        dtype=np.float64, count=2 * int(lengths.sum())
+    ).reshape(-1, 2)
+    ends = np.cumsum(lengths)
+    centers = np.add.reduceat(flat, ends - lengths, axis=0) / lengths[:, None]
+
     polygons = []
-    
-    for element in data.get("elements", []):
-        if element.get("type") != "way":
-            continue
-            
-        geometry = element.get("geometry", [])
-        if not geometry:
-            continue
-            
-        coords = [(pt["lat"], pt["lon"]) for pt in geometry]
+    for element, coords, center in zip(
+        ways, np.split(flat, ends[:-1]), centers.tolist()
+    ):
         tags = element.get("tags", {})
-        
         polygons.append({
             "id": element.get("id"),
-            "coordinates": coords,
+            "coordinates": coords.tolist(),
             "type": tags.get("building", "unknown"),
-            "center": (
-                sum(c[0] for c in coords) / len(coords),
-                sum(c[1] for c in coords) / len(coords)
-            )
+            "center": tuple(center)
         })
     
     return polygons
@@ -0,0 +1,232 @@
+"""
+Tests for cache_manager: sharing one cache directory between managers and
+the in-memory GeoDataFrame cache, and split multi-cell downloads.
+
+Overture is replaced by the in-memory reader from test_ms_buildings, so
+no network access is needed.  Run with ``python -m unittest discover tests``.
+"""
+
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import shapely
+
+import geopandas as gpd
+import pyarrow as pa
+
+import cache_manager
+import overturemaps
+from test_ms_buildings import _fake_reader
+
+_AREA_BBOX = (-95.82, 36.05, -95.80, 36.07)  # a single download cell
+
+
+def _houses(bbox, n=10):
+    """*n* x *n* small boxes spread evenly over *bbox* ({id: geometry})."""
+    xmin, ymin, xmax, ymax = bbox
+    step_x, step_y = (xmax - xmin) / n, (ymax - ymin) / n
+    return {
+        f"h-{i}-{j}": shapely.box(
+            xmin + i * step_x, ymin + j * step_y,
+            xmin + i * step_x + step_x / 4, ymin + j * step_y + step_y / 4,
+        )
+        for i in range(n) for j in range(n)
+    }
+
+
+class CacheManagerTestCase(unittest.TestCase):
+    """Temporary cache directory plus a fake Overture source."""
+
+    buildings = _houses(_AREA_BBOX)
+
+    def setUp(self):
+        patcher = mock.patch.object(overturemaps, "record_batch_reader", _fake_reader(self.buildings))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def manager(self) -> cache_manager.CacheManager:
+        mgr = cache_manager.CacheManager(self.cache_dir)
+        self.addCleanup(mgr.flush_access_times)  # before the directory is removed
+        return mgr
+
+    def names_on_disk(self):
+        index = json.loads((self.cache_dir / "cache_index.json").read_text())
+        return sorted(a["name"] for a in index["areas"])
+
+
+class SharedIndexTest(CacheManagerTestCase):
+    def test_access_flush_keeps_areas_added_by_another_manager(self):
+        a = self.manager()
+        one = a.cache_area(_AREA_BBOX, "one", 36.06, -95.81)
+        b = self.manager()
+
+        a.load_geodataframe(one["id"])  # buffers a last_accessed update
+        b.cache_area(_AREA_BBOX, "two", 36.06, -95.81)
+        a.flush_access_times()
+
+        self.assertEqual(self.names_on_disk(), ["one", "two"])
+        self.assertEqual(sorted(x["name"] for x in a.get_cached_areas()), ["one", "two"])
+        stored = {x["name"]: x for x in self.manager().get_cached_areas()}
+        self.assertGreaterEqual(stored["one"]["last_accessed"], one["last_accessed"])
+
+    def test_access_flush_does_not_resurrect_area_deleted_elsewhere(self):
+        a = self.manager()
+        one = a.cache_area(_AREA_BBOX, "one", 36.06, -95.81)
+        a.cache_area(_AREA_BBOX, "two", 36.06, -95.81)
+        b = self.manager()
+
+        a.load_geodataframe(one["id"])
+        self.assertTrue(b.delete_area(one["id"]))
+        a.flush_access_times()
+
+        self.assertEqual(self.names_on_disk(), ["two"])
+
+
+class GeoDataFrameCacheTest(CacheManagerTestCase):
+    """Each area holds 100 buildings; the resident budget is patched to 250."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(cache_manager, "GDF_CACHE_MAX_BUILDINGS", 250)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mgr = self.manager()
+        self.ids = [self.mgr.cache_area(_AREA_BBOX, name, 36.06, -95.81)["id"]
+                    for name in ("a", "b", "c")]
+
+    def reads(self, *area_ids):
+        """Load each area in turn; return how many parquet reads that took."""
+        with mock.patch.object(cache_manager.gpd, "read_parquet", wraps=gpd.read_parquet) as read:
+            for area_id in area_ids:
+                self.assertEqual(len(self.mgr.load_geodataframe(area_id)), 100)
+        return read.call_count
+
+    def test_evicts_least_recently_used_over_building_budget(self):
+        a, b, c = self.ids
+        self.assertEqual(self.reads(a, b), 2)
+        self.assertEqual(self.reads(a, b), 0)
+        self.assertEqual(self.reads(c), 1)  # 300 > 250: a is evicted
+        self.assertEqual(self.reads(b, c), 0)
+        self.assertEqual(self.reads(a), 1)
+        self.assertLessEqual(self.mgr._gdf_cached_rows, 250)
+
+    def test_area_over_budget_is_not_resident(self):
+        with mock.patch.object(cache_manager, "GDF_CACHE_MAX_BUILDINGS", 50):
+            self.assertEqual(self.reads(self.ids[0], self.ids[0]), 2)
+        self.assertEqual(self.mgr._gdf_cached_rows, 0)
+
+    def test_delete_area_drops_its_cached_frames(self):
+        a, b, _ = self.ids
+        self.reads(a, b)
+        self.assertTrue(self.mgr.delete_area(a))
+        self.assertIsNone(self.mgr.load_geodataframe(a))
+        self.assertEqual(self.reads(b), 0)
+        self.assertEqual(self.mgr._gdf_cached_rows, 100)
+
+    def test_clear_all_drops_every_cached_frame(self):
+        self.reads(*self.ids[:2])
+        self.assertEqual(self.mgr.clear_all(), 3)
+        for area_id in self.ids:
+            self.assertIsNone(self.mgr.load_geodataframe(area_id))
+        self.assertEqual(self.mgr._gdf_cached_rows, 0)
+
+
+def _one_row_batches(reader_fn, fail_cell=None):
+    """Wrap *reader_fn* to stream single-row batches, raising after the
+    first one for *fail_cell*."""
+    def record_batch_reader(kind, bbox, **kwargs):
+        for i, batch in enumerate(reader_fn(kind, bbox, **kwargs).read_all().to_batches(max_chunksize=1)):
+            if bbox == fail_cell and i == 1:
+                raise RuntimeError("connection reset")
+            yield batch
+    return record_batch_reader
+
+
+class SplitDownloadTest(unittest.TestCase):
+    """_DOWNLOAD_CELL_DEG is patched so _AREA_BBOX splits into 2 x 2 cells."""
+
+    buildings = _houses(_AREA_BBOX)
+    # Straddle the inner edges (lon -95.81, lat 36.06), their crossing point,
+    # and the outer bbox edges (clamped into the cell they overhang)
+    buildings.update({
+        "across-lon": shapely.box(-95.8105, 36.0652, -95.8095, 36.0658),
+        "across-lat": shapely.box(-95.8048, 36.0595, -95.8042, 36.0605),
+        "across-both": shapely.box(-95.8103, 36.0597, -95.8097, 36.0603),
+        "across-outer": shapely.box(-95.8203, 36.0521, -95.8196, 36.0526),
+        "across-top": shapely.box(-95.8048, 36.0697, -95.8042, 36.0704),
+    })
+
+    def setUp(self):
+        for name, value in (("_DOWNLOAD_CELL_DEG", 0.0101), ("_DOWNLOAD_QUEUE_SIZE", 2)):
+            patcher = mock.patch.object(cache_manager, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cells = cache_manager._split_bbox(_AREA_BBOX)
+
+    def download(self, reader, limit=None):
+        """Run _iter_building_batches on a thread; return (ids, error).
+
+        Fails instead of hanging if the generator does not finish.
+        """
+        ids, error = [], []
+
+        def run():
+            gen = cache_manager._iter_building_batches(_AREA_BBOX)
+            try:
+                for batch in gen:
+                    ids.extend(batch.column("id").to_pylist())
+                    if limit is not None and len(ids) >= limit:
+                        gen.close()  # consumer gives up early
+                        break
+            except Exception as exc:
+                error.append(exc)
+
+        with mock.patch.object(overturemaps, "record_batch_reader", reader):
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), "download did not finish")
+        return ids, error[0] if error else None
+
+    def test_split_covers_bbox_in_four_cells(self):
+        self.assertEqual(len(self.cells), 4)
+        self.assertEqual(shapely.union_all([shapely.box(*c) for c in self.cells]).bounds, _AREA_BBOX)
+
+    def test_each_building_is_downloaded_exactly_once(self):
+        ids, error = self.download(_one_row_batches(_fake_reader(self.buildings)))
+        self.assertIsNone(error)
+        self.assertEqual(sorted(ids), sorted(self.buildings))
+
+    def test_straddling_building_is_owned_by_one_cell(self):
+        batch = _fake_reader(self.buildings)("building", _AREA_BBOX).read_next_batch()
+        owners = {
+            bid: [i for i, cell in enumerate(self.cells)
+                  if bid in cache_manager._owned_rows(batch, cell, _AREA_BBOX).column("id").to_pylist()]
+            for bid in ("across-lon", "across-lat", "across-both", "across-outer", "across-top")
+        }
+        # Cells run west to east, then south to north; the min corner decides
+        self.assertEqual(owners, {
+            "across-lon": [2], "across-lat": [1], "across-both": [0],
+            "across-outer": [0], "across-top": [3],
+        })
+
+    def test_failing_cell_raises_without_hanging(self):
+        reader = _one_row_batches(_fake_reader(self.buildings), fail_cell=self.cells[2])
+        _, error = self.download(reader)
+        self.assertIsInstance(error, RuntimeError)
+
+    def test_consumer_closing_early_does_not_hang(self):
+        ids, error = self.download(_one_row_batches(_fake_reader(self.buildings)), limit=3)
+        self.assertIsNone(error)
+        self.assertEqual(len(ids), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Tests for ms_buildings: bounding-box maths, UTM areas and cache/Overture
+consistency.
+
+Overture is replaced by an in-memory record batch reader, so no network
+access is needed.  Run with ``python -m unittest discover tests``.
+"""
+
+import math
+import tempfile
+import unittest
+from unittest import mock
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import shapely
+
+import cache_manager
+import ms_buildings
+import overturemaps
+
+_BBOX_TYPE = pa.struct([
+    ("xmin", pa.float32()), ("xmax", pa.float32()),
+    ("ymin", pa.float32()), ("ymax", pa.float32()),
+])
+_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    pa.field("geometry", pa.binary(), metadata={b"ARROW:extension:name": b"geoarrow.wkb"}),
+    ("bbox", _BBOX_TYPE),
+    ("height", pa.float64()),
+    ("class", pa.string()),
+    ("subtype", pa.string()),
+])
+
+
+def _fake_reader(buildings):
+    """record_batch_reader stand-in serving *buildings* ({id: geometry})."""
+    def record_batch_reader(kind, bbox, **kwargs):
+        xmin, ymin, xmax, ymax = bbox
+        hits = [
+            (bid, geom) for bid, geom in buildings.items()
+            if geom.bounds[0] <= xmax and geom.bounds[2] >= xmin
+            and geom.bounds[1] <= ymax and geom.bounds[3] >= ymin
+        ]
+        batch = pa.record_batch([
+            pa.array([bid for bid, _ in hits], pa.string()),
+            pa.array([geom.wkb for _, geom in hits], pa.binary()),
+            pa.array([dict(zip(("xmin", "ymin", "xmax", "ymax"), geom.bounds)) for _, geom in hits], _BBOX_TYPE),
+            pa.array([3.0] * len(hits)),
+            pa.array(["house"] * len(hits)),
+            pa.array(["residential"] * len(hits)),
+        ], schema=_SCHEMA)
+        return pa.RecordBatchReader.from_batches(_SCHEMA, [batch])
+    return record_batch_reader
+
+
+def _spherical_bounding_box(lat, lon, radius_meters):
+    """The exact spherical bbox get_bounding_box used to compute everywhere."""
+    angular_distance = radius_meters / 6371000
+    delta_lat = math.degrees(angular_distance)
+    delta_lon = math.degrees(
+        math.asin(min(1.0, math.sin(angular_distance) / math.cos(math.radians(lat))))
+    )
+    return (lon - delta_lon, lat - delta_lat, lon + delta_lon, lat + delta_lat)
+
+
+class BoundingBoxTest(unittest.TestCase):
+    def test_matches_spherical_formula_within_a_metre(self):
+        for lat in range(0, 86, 5):
+            for radius in (10, 100, 1000, 5000, 10000):
+                for sign in (1, -1):
+                    got = ms_buildings.get_bounding_box(sign * lat, 12.5, radius)
+                    want = _spherical_bounding_box(sign * lat, 12.5, radius)
+                    metres_per_deg_lon = 6371000 * math.cos(math.radians(lat)) * math.pi / 180
+                    metres_per_deg_lat = 6371000 * math.pi / 180
+                    for i, scale in enumerate((metres_per_deg_lon, metres_per_deg_lat) * 2):
+                        self.assertLess(abs(got[i] - want[i]) * scale, 1.0, (lat, radius, i))
+
+
+class UtmTotalAreaTest(unittest.TestCase):
+    """_utm_total_area must agree with projecting every geometry via to_crs."""
+
+    @staticmethod
+    def _expected(geoms, lat, lon):
+        utm_crs = ms_buildings._get_utm_crs(lat, lon)
+        return float(gpd.GeoSeries(geoms, crs="EPSG:4326").to_crs(utm_crs).area.sum())
+
+    @staticmethod
+    def _geometries(lat, lon, n=200):
+        rng = np.random.default_rng(0)
+        houses = [
+            shapely.affinity.rotate(shapely.box(x, y, x + 0.0002, y + 0.00015), angle)
+            for x, y, angle in zip(
+                lon + rng.uniform(-0.03, 0.03, n),
+                lat + rng.uniform(-0.03, 0.03, n),
+                rng.uniform(0, 90, n),
+            )
+        ]
+        courtyard = shapely.Polygon(
+            shapely.box(lon, lat, lon + 0.001, lat + 0.001).exterior.coords,
+            [shapely.box(lon + 0.0002, lat + 0.0002, lon + 0.0005, lat + 0.0005).exterior.coords[::-1]],
+        )
+        terrace = shapely.MultiPolygon([courtyard, shapely.box(lon - 0.01, lat - 0.01, lon - 0.0098, lat - 0.0099)])
+        extras = [courtyard, terrace, shapely.Polygon(), None, shapely.MultiPolygon()]
+        return np.array(houses + extras, dtype=object)
+
+    def test_matches_to_crs_area(self):
+        for lat, lon in ((36.06, -95.81), (-33.87, 151.21), (64.15, -21.94), (0.0, 0.0)):
+            geoms = self._geometries(lat, lon)
+            want = self._expected(geoms, lat, lon)
+            got = ms_buildings._utm_total_area(geoms, lat, lon)
+            self.assertLess(abs(got - want) / want, 1e-13, (lat, lon))
+
+    def test_holes_and_multipolygons(self):
+        geoms = self._geometries(36.06, -95.81)[-5:-3]  # courtyard, terrace
+        want = self._expected(geoms, 36.06, -95.81)
+        self.assertLess(abs(ms_buildings._utm_total_area(geoms, 36.06, -95.81) - want) / want, 1e-13)
+
+    def test_empty_and_missing_geometries(self):
+        for geoms in ([], [None], [shapely.Polygon()], [None, shapely.MultiPolygon(), shapely.Polygon()]):
+            self.assertEqual(ms_buildings._utm_total_area(np.array(geoms, dtype=object), 36.06, -95.81), 0.0)
+
+    def test_non_polygonal_input_falls_back_to_to_crs(self):
+        geoms = np.array([shapely.box(-95.81, 36.06, -95.8098, 36.0601), shapely.Point(-95.81, 36.06)], dtype=object)
+        self.assertAlmostEqual(
+            ms_buildings._utm_total_area(geoms, 36.06, -95.81), self._expected(geoms, 36.06, -95.81), places=6
+        )
+
+
+class CacheRouteConsistencyTest(unittest.TestCase):
+    LAT, LON, RADIUS = 36.06, -95.81, 3000
+
+    def setUp(self):
+        ms_buildings._query_cache.clear()
+        self.addCleanup(ms_buildings._query_cache.clear)
+
+        # A grid of houses around the centre, plus one just inside the UTM
+        # circle's northern edge but north of get_bounding_box's latitude span
+        buildings = {
+            f"grid-{i}-{j}": shapely.box(x, y, x + 0.0001, y + 0.0001)
+            for i, x in enumerate(self.LON + (k - 20) * 0.0015 for k in range(41))
+            for j, y in enumerate(self.LAT + (k - 20) * 0.0012 for k in range(41))
+        }
+        circle_top = ms_buildings._search_circle(self.LAT, self.LON, self.RADIUS).bounds[3]
+        sphere_top = ms_buildings.get_bounding_box(self.LAT, self.LON, self.RADIUS)[3]
+        edge_lat = sphere_top + (circle_top - sphere_top) * 0.3
+        buildings["edge"] = shapely.box(self.LON - 1e-6, edge_lat, self.LON + 1e-6, edge_lat + 1e-7)
+
+        patcher = mock.patch.object(overturemaps, "record_batch_reader", _fake_reader(buildings))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        manager = cache_manager.CacheManager(tmp.name)
+        self.addCleanup(manager.flush_access_times)  # before tmp is removed
+        patcher = mock.patch.object(cache_manager, "_default_instance", manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = manager
+
+    def test_cached_area_and_overture_return_same_count(self):
+        from_overture = ms_buildings.count_buildings_in_radius(self.LAT, self.LON, self.RADIUS)
+
+        self.manager.cache_area((-95.9, 36.0, -95.7, 36.1), "test", self.LAT, self.LON)
+        ms_buildings._query_cache.clear()
+        from_disk = ms_buildings.count_buildings_in_radius(self.LAT, self.LON, self.RADIUS)
+
+        self.assertEqual(from_overture[0], from_disk[0])
+        self.assertAlmostEqual(from_overture[1], from_disk[1], places=3)
+        ids = set(ms_buildings.query_ms_buildings_in_radius(self.LAT, self.LON, self.RADIUS)[1]["id"])
+        self.assertIn("edge", ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
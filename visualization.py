@@ -4,15 +4,24 @@ Visualization module for creating map images with Google Tiles background.
 import io
 import math
 import os
+import queue
+import tempfile
+import threading
 import time
-from typing import List, Tuple, Optional
-from PIL import Image, ImageDraw, ImageFont
+from pathlib import Path
+from typing import Callable, List, Literal, Tuple, Optional
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, features
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, repeat
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-# Platform-aware font discovery
+# Platform-aware font discovery (HOUSECOUNTER_FONT, if set, is tried first)
 _FONT_SEARCH_PATHS = [
     # macOS
     "/System/Library/Fonts/Helvetica.ttc",
@@ -25,10 +34,16 @@ _FONT_SEARCH_PATHS = [
 ]
 
 
+@lru_cache(maxsize=32)
 def _find_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    """Return the first available TrueType font at *size*, or the built-in default."""
-    for path in _FONT_SEARCH_PATHS:
-        if os.path.isfile(path):
+    """
+    Return the first available TrueType font at *size*, or the built-in default.
+
+    Cached per size so each render reuses the parsed face instead of
+    searching the filesystem and loading glyph tables again.
+    """
+    for path in (os.getenv("HOUSECOUNTER_FONT"), *_FONT_SEARCH_PATHS):
+        if path and os.path.isfile(path):
             try:
                 return ImageFont.truetype(path, size)
             except Exception:
@@ -53,6 +68,39 @@ else:
     # Public endpoint (no API key)
     GOOGLE_TILE_URL = "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}"
 
+# On-disk tile cache: raw response bytes stored as {dir}/{z}/{x}/{y}.img
+# (PIL sniffs the actual format) with the server's ETag alongside.
+TILE_CACHE_DIR = Path(os.getenv("TILE_CACHE_DIR", Path.home() / ".cache" / "house-counter" / "tiles"))
+TILE_CACHE_DAYS = 14  # older tiles are revalidated with If-None-Match
+
+# Shared session: one keep-alive connection per download thread to the tile
+# host instead of a fresh TCP+TLS handshake for every tile. Throttling and
+# transient gateway errors are retried with backoff on the same connection.
+# Retry-After is ignored so one throttled tile can't stall a render for as
+# long as the server asks; the backoff alone stays under two seconds.
+_TILE_WORKERS = 20
+_PREFETCH_WORKERS = 4
+_TILE_RETRY = Retry(
+    total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504],
+    respect_retry_after_header=False,
+)
+_SESSION = requests.Session()
+_SESSION.headers["User-Agent"] = "Mozilla/5.0 (compatible; HouseCounter/1.0)"
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=_TILE_WORKERS + _PREFETCH_WORKERS, max_retries=_TILE_RETRY
+))
+
+# Speculative prefetch into the disk cache of the ring of tiles around each
+# rendered grid plus the parent-zoom block, so a pan or zoom-out is served
+# locally. Off unless TILE_PREFETCH is set, so batch runs don't hammer the
+# tile server. Served by daemon threads (started on first use) so pending
+# speculative work never delays interpreter exit; tiles are written via a
+# temp file, so an abandoned download leaves no partial tile behind.
+TILE_PREFETCH = os.getenv("TILE_PREFETCH", "").lower() in ("1", "true", "yes")
+_prefetch_queue: "queue.SimpleQueue[Tuple[int, int, int]]" = queue.SimpleQueue()
+_prefetch_threads: List[threading.Thread] = []
+_prefetch_lock = threading.Lock()
+
 
 def lat_lon_to_tile(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
     """Convert lat/lon to tile coordinates at given zoom level."""
@@ -105,21 +153,48 @@ def lat_lon_to_pixel(
     return pixel_x, pixel_y
 
 
+def _lat_lon_to_pixels(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    origin_x: int,
+    origin_y: int,
+    world_scale: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized lat_lon_to_pixel over coordinate arrays (same truncation).
+
+    The render-wide invariants are precomputed by the caller: world_scale is
+    2**zoom * tile_size and origin_x/origin_y is the grid's top-left pixel
+    in world coordinates.
+    """
+    world_x = (lons + 180.0) / 360.0 * world_scale
+    world_y = (1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * world_scale
+    pixel_x = (world_x - origin_x).astype(np.int32)
+    pixel_y = (world_y - origin_y).astype(np.int32)
+    return pixel_x, pixel_y
+
+
+# Approximate meters per pixel at the equator for zoom levels 0-20
+# At zoom 0, the entire world is 256 pixels, Earth's circumference ~40,075 km
+_EQUATOR_METERS_PER_PIXEL = tuple(40075016.686 / 256 / (2 ** zoom) for zoom in range(21))
+
+
+@lru_cache(maxsize=256)
 def calculate_zoom_for_radius(radius_meters: float) -> int:
     """Calculate appropriate zoom level for a given radius."""
-    # Approximate meters per pixel at equator for each zoom level
-    # At zoom 0, the entire world is 256 pixels, Earth's circumference ~40,075 km
-    meters_per_pixel_at_equator = 40075016.686 / 256
-    
     for zoom in range(20, 0, -1):
-        meters_per_pixel = meters_per_pixel_at_equator / (2 ** zoom)
         # We want the radius to fit in about 1/3 of the image
-        pixels_for_radius = radius_meters / meters_per_pixel
+        pixels_for_radius = radius_meters / _EQUATOR_METERS_PER_PIXEL[zoom]
         if pixels_for_radius < 400:  # Target around 400 pixels for the radius
             return zoom
     return 15
 
 
+def _meters_per_pixel(lat: float, zoom: int) -> float:
+    """Ground resolution of a 256px tile pixel at *lat*."""
+    return 40075016.686 * math.cos(math.radians(lat)) / (256 * 2**zoom)
+
+
 def calculate_grid_size_for_zoom(
     radius_meters: float, 
     zoom: int, 
@@ -162,24 +237,141 @@ def estimate_processing_time(grid_size: int) -> str:
         return f"~{seconds/3600:.1f} hours"
 
 
-def fetch_tile(x: int, y: int, zoom: int) -> Tuple[int, int, Image.Image | None]:
-    """Fetch a single Google Maps tile. Returns (x, y, image)."""
+def _tile_cache_path(x: int, y: int, zoom: int) -> Path:
+    return TILE_CACHE_DIR / str(zoom) / str(x) / f"{y}.img"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write *data* to *path* via a temp file so readers never see a partial tile."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _store_tile(path: Path, content: bytes, etag: Optional[str]) -> None:
+    """Persist a downloaded tile; cache failures never fail the fetch."""
+    etag_path = path.with_suffix(".etag")
+    try:
+        _write_atomic(path, content)
+        if etag:
+            _write_atomic(etag_path, etag.encode())
+        else:
+            etag_path.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _tile_bytes(x: int, y: int, zoom: int) -> bytes:
+    """Raw tile bytes from the disk cache, revalidating or downloading as needed."""
+    path = _tile_cache_path(x, y, zoom)
+    headers = {}
+    try:
+        age = time.time() - path.stat().st_mtime
+    except OSError:
+        age = None
+
+    if age is not None:
+        if age < TILE_CACHE_DAYS * 86400:
+            return path.read_bytes()
+        # Stale: ask the server whether our copy is still current
+        try:
+            headers["If-None-Match"] = path.with_suffix(".etag").read_text()
+        except OSError:
+            pass
+
     url = GOOGLE_TILE_URL.format(x=x, y=y, z=zoom)
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; HouseCounter/1.0)"
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        return (x, y, Image.open(io.BytesIO(response.content)))
+        response = _SESSION.get(url, headers=headers, timeout=10)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException:
+        if age is None:
+            raise
+        return path.read_bytes()  # offline or failing: a stale tile beats none
+    if response.status_code == 304:
+        os.utime(path)  # restart the freshness window
+        return path.read_bytes()
+    _store_tile(path, response.content, response.headers.get("ETag"))
+    return response.content
+
+
+def fetch_tile(x: int, y: int, zoom: int) -> Tuple[int, int, Image.Image | None]:
+    """Fetch a single Google Maps tile, via the disk cache. Returns (x, y, image)."""
+    try:
+        img = Image.open(io.BytesIO(_tile_bytes(x, y, zoom)))
+        # Decode here on the download thread (PIL releases the GIL in its
+        # codecs) rather than lazily on first use by the compositor
+        img.load()
+        return (x, y, img)
     except Exception as e:
         return (x, y, None)
 
 
+def _prefetch_tile(x: int, y: int, zoom: int) -> None:
+    """Bring a tile into the disk cache without decoding it."""
+    try:
+        if time.time() - _tile_cache_path(x, y, zoom).stat().st_mtime < TILE_CACHE_DAYS * 86400:
+            return  # already fresh on disk; don't read it just to discard it
+    except OSError:
+        pass
+    try:
+        _tile_bytes(x, y, zoom)
+    except Exception:
+        pass
+
+
+def _prefetch_worker() -> None:
+    while True:
+        _prefetch_tile(*_prefetch_queue.get())
+
+
+def _start_prefetch_workers() -> None:
+    with _prefetch_lock:
+        if _prefetch_threads:
+            return
+        for i in range(_PREFETCH_WORKERS):
+            thread = threading.Thread(target=_prefetch_worker, name=f"tile-prefetch-{i}", daemon=True)
+            thread.start()
+            _prefetch_threads.append(thread)
+
+
+def _schedule_prefetch(start_tile_x: int, start_tile_y: int, grid_size: int, zoom: int) -> None:
+    """Queue the grid's surrounding ring and its parent 2x2 block for prefetch."""
+    if not TILE_PREFETCH:
+        return
+    _start_prefetch_workers()
+    n = 2 ** zoom
+    x0, y0 = start_tile_x - 1, start_tile_y - 1
+    x1, y1 = start_tile_x + grid_size, start_tile_y + grid_size
+    tiles = [(x, y, zoom) for x in range(x0, x1 + 1) for y in (y0, y1)]
+    tiles += [(x, y, zoom) for x in (x0, x1) for y in range(y0 + 1, y1)]
+    tiles = [(x, y, z) for x, y, z in tiles if 0 <= x < n and 0 <= y < n]
+    
+    if zoom > 0:
+        # Parent of the centre tile together with its three siblings
+        half_grid = grid_size // 2
+        px = ((start_tile_x + half_grid) >> 1) & ~1
+        py = ((start_tile_y + half_grid) >> 1) & ~1
+        tiles += [
+            (x, y, zoom - 1) for y in (py, py + 1) for x in (px, px + 1)
+            if 0 <= x < n // 2 and 0 <= y < n // 2
+        ]
+    
+    for tile in tiles:
+        _prefetch_queue.put(tile)
+
+
 def fetch_tiles_parallel(
     tiles: List[Tuple[int, int, int]], 
     max_workers: int = 10,
-    progress_callback=None
+    progress_callback=None,
+    on_tile: Optional[Callable[[int, int, Image.Image], None]] = None
 ) -> dict:
     """
     Fetch multiple tiles in parallel.
@@ -188,10 +380,21 @@ def fetch_tiles_parallel(
         tiles: List of (x, y, zoom) tuples
         max_workers: Number of parallel download threads
         progress_callback: Optional callback(completed, total) for progress updates
+        on_tile: Optional callback(x, y, image) run on the download thread as
+            each tile arrives; the image is then dropped instead of collected,
+            so peak memory no longer grows with the grid. Must be thread-safe
+            (writing disjoint cells of a shared array is).
     
     Returns:
-        Dict mapping (x, y) to Image
+        Dict mapping (x, y) to Image (empty when on_tile is given)
     """
+    def fetch(x: int, y: int, z: int):
+        x, y, img = fetch_tile(x, y, z)
+        if on_tile is None or img is None:
+            return x, y, img
+        on_tile(x, y, img)
+        return x, y, None
+    
     results = {}
     total = len(tiles)
     completed = 0
@@ -200,7 +403,7 @@ def fetch_tiles_parallel(
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {
-            executor.submit(fetch_tile, x, y, z): (x, y) 
+            executor.submit(fetch, x, y, z): (x, y) 
             for x, y, z in tiles
         }
         
@@ -222,6 +425,86 @@ def fetch_tiles_parallel(
     return results
 
 
+def _grid_tiles(start_tile_x: int, start_tile_y: int, grid_size: int, zoom: int) -> List[Tuple[int, int, int]]:
+    """(x, y, zoom) for every tile of a grid_size x grid_size grid, row by row."""
+    dy, dx = np.mgrid[0:grid_size, 0:grid_size]
+    tile_xs = (start_tile_x + dx).ravel().tolist()
+    tile_ys = (start_tile_y + dy).ravel().tolist()
+    return list(zip(tile_xs, tile_ys, repeat(zoom)))
+
+
+def _place_tile(composite: np.ndarray, img: Image.Image, dx: int, dy: int, tile_size: int) -> None:
+    """Copy a decoded tile into its (dx, dy) grid cell of the RGB composite array."""
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    tile = np.asarray(img)[:tile_size, :tile_size]
+    y0, x0 = dy * tile_size, dx * tile_size
+    composite[y0:y0 + tile.shape[0], x0:x0 + tile.shape[1]] = tile
+
+
+class _OverlayPanel:
+    """
+    Records semi-transparent overlay shapes (same calls as ImageDraw), then
+    blends only their bounding region into the map instead of compositing a
+    full-size RGBA layer over the whole image.
+    """
+
+    def __init__(self):
+        self._ops = []
+
+    def rectangle(self, xy, **kwargs) -> None:
+        self._ops.append(("rectangle", list(xy), kwargs))
+
+    def ellipse(self, xy, **kwargs) -> None:
+        self._ops.append(("ellipse", list(xy), kwargs))
+
+    def text(self, xy, text: str, **kwargs) -> None:
+        self._ops.append(("text", list(xy), dict(kwargs, text=text)))
+
+    def _bounds(self) -> Tuple[int, int, int, int]:
+        boxes = []
+        for method, xy, kwargs in self._ops:
+            if method == "text":
+                left, top, right, bottom = kwargs["font"].getbbox(kwargs["text"])
+                boxes.append((xy[0] + left, xy[1] + top, xy[0] + right, xy[1] + bottom))
+            else:
+                boxes.append((xy[0], xy[1], xy[2] + 1, xy[3] + 1))
+        # Small margin for antialiasing; transparent pixels leave the map unchanged
+        return (
+            int(min(b[0] for b in boxes)) - 2, int(min(b[1] for b in boxes)) - 2,
+            int(max(b[2] for b in boxes)) + 2, int(max(b[3] for b in boxes)) + 2,
+        )
+
+    def blend_onto(self, image: Image.Image) -> None:
+        """Alpha-composite the recorded shapes onto RGB *image* in place."""
+        if not self._ops:
+            return
+        x0, y0, x1, y1 = self._bounds()
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, image.width), min(y1, image.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        overlay = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        overlay_draw = ImageDraw.Draw(overlay)
+        for method, xy, kwargs in self._ops:
+            shifted = [v - (x0 if i % 2 == 0 else y0) for i, v in enumerate(xy)]
+            getattr(overlay_draw, method)(shifted, **kwargs)
+
+        region = (x0, y0, x1, y1)
+        blended = Image.alpha_composite(image.crop(region).convert("RGBA"), overlay)
+        image.paste(blended.convert("RGB"), region[:2])
+
+
+def _to_palette(img: Image.Image) -> Image.Image:
+    """256-colour paletted copy of *img* (libimagequant when Pillow has it)."""
+    if features.check_feature("libimagequant"):
+        method = Image.Quantize.LIBIMAGEQUANT
+    else:
+        method = Image.Quantize.FASTOCTREE
+    return img.quantize(colors=256, method=method, dither=Image.Dither.FLOYDSTEINBERG)
+
+
 def create_map_image(
     center_lat: float,
     center_lon: float,
@@ -229,7 +512,8 @@ def create_map_image(
     buildings: List[dict],
     tile_size: int = 256,
     grid_size: int = 5,
-    zoom: Optional[int] = None
+    zoom: Optional[int] = None,
+    output_mode: Literal["rgb", "palette"] = "rgb"
 ) -> Image.Image:
     """
     Create a map image with Google Tiles background and building markers.
@@ -242,6 +526,9 @@ def create_map_image(
         tile_size: Size of each tile (default 256)
         grid_size: Number of tiles in each direction (default 5, auto-calculated if zoom is specified)
         zoom: Optional zoom level override (default: auto-calculated based on radius)
+        output_mode: "rgb" (default), or "palette" for an 8-bit paletted image
+            that encodes to a much smaller PNG. The flat overlay colours cover
+            many pixels, so the quantizer gives them their own palette entries.
     
     Returns:
         PIL Image with map and overlays
@@ -266,34 +553,30 @@ def create_map_image(
     start_tile_x = center_tile_x - half_grid
     start_tile_y = center_tile_y - half_grid
     
+    # Invariants shared by every pixel conversion in this render
+    world_scale = (1 << zoom) * tile_size
+    origin_x, origin_y = start_tile_x * tile_size, start_tile_y * tile_size
+    
     # Create composite image
     img_width = tile_size * actual_grid_size
     img_height = tile_size * actual_grid_size
     
     print(f"Output image size: {img_width}x{img_height} pixels")
     
-    composite = Image.new("RGB", (img_width, img_height), (200, 200, 200))
+    composite_arr = np.full((img_height, img_width, 3), 200, dtype=np.uint8)
     
     # Build list of tiles to fetch
-    tiles_to_fetch = []
-    for dy in range(actual_grid_size):
-        for dx in range(actual_grid_size):
-            tile_x = start_tile_x + dx
-            tile_y = start_tile_y + dy
-            tiles_to_fetch.append((tile_x, tile_y, zoom))
-    
-    # Fetch tiles in parallel
+    tiles_to_fetch = _grid_tiles(start_tile_x, start_tile_y, actual_grid_size, zoom)
+    
+    # Fetch tiles in parallel, placing each in the composite as it arrives
     print("Downloading tiles...")
-    tile_images = fetch_tiles_parallel(tiles_to_fetch, max_workers=20)
+    def place(tile_x: int, tile_y: int, tile_img: Image.Image) -> None:
+        _place_tile(composite_arr, tile_img, tile_x - start_tile_x, tile_y - start_tile_y, tile_size)
     
-    # Place tiles in composite
-    print("Compositing tiles...")
-    for dy in range(actual_grid_size):
-        for dx in range(actual_grid_size):
-            tile_x = start_tile_x + dx
-            tile_y = start_tile_y + dy
-            if (tile_x, tile_y) in tile_images:
-                composite.paste(tile_images[(tile_x, tile_y)], (dx * tile_size, dy * tile_size))
+    fetch_tiles_parallel(tiles_to_fetch, max_workers=_TILE_WORKERS, on_tile=place)
+    _schedule_prefetch(start_tile_x, start_tile_y, actual_grid_size, zoom)
+    composite = Image.fromarray(composite_arr)
+    del composite_arr  # PIL holds its own copy; free this before drawing
     
     draw = ImageDraw.Draw(composite, "RGBA")
     
@@ -305,7 +588,7 @@ def create_map_image(
     )
     
     # Calculate pixel radius
-    meters_per_pixel = 40075016.686 * math.cos(math.radians(center_lat)) / (256 * 2**zoom)
+    meters_per_pixel = _meters_per_pixel(center_lat, zoom)
     radius_px = int(radius_meters / meters_per_pixel)
     
     # Draw search radius circle
@@ -321,19 +604,34 @@ def create_map_image(
     
     # Draw building polygons
     print(f"Drawing {len(buildings)} building polygons...")
-    for building in buildings:
-        coords = building.get("coordinates", [])
-        if len(coords) < 3:
-            continue
-            
-        # Convert to pixel coordinates
-        pixel_coords = []
-        for lat, lon in coords:
-            px, py = lat_lon_to_pixel(lat, lon, start_tile_x, start_tile_y, zoom, tile_size)
-            pixel_coords.append((px, py))
+    rings = [c for c in (b.get("coordinates", []) for b in buildings) if len(c) >= 3]
+    if rings:
+        # Convert every vertex in one pass, then split back per polygon
+        counts = np.fromiter(map(len, rings), dtype=np.intp, count=len(rings))
+        flat = np.fromiter(chain.from_iterable(chain.from_iterable(rings)), dtype=np.float64, count=2 * int(counts.sum()))
+        lats, lons = flat[0::2], flat[1::2]
         
-        # Draw filled polygon
-        draw.polygon(pixel_coords, fill=(255, 0, 0, 100), outline=(255, 0, 0, 255))
+        # Skip polygons whose bbox lies entirely off the image (grid bounds
+        # padded by one pixel so edge-touching polygons are never dropped)
+        pad = 1.0 / tile_size
+        grid_north, grid_west = tile_to_lat_lon(start_tile_x - pad, start_tile_y - pad, zoom)
+        grid_south, grid_east = tile_to_lat_lon(start_tile_x + actual_grid_size + pad, start_tile_y + actual_grid_size + pad, zoom)
+        starts = np.cumsum(counts) - counts
+        visible = (
+            (np.maximum.reduceat(lats, starts) >= grid_south)
+            & (np.minimum.reduceat(lats, starts) <= grid_north)
+            & (np.maximum.reduceat(lons, starts) >= grid_west)
+            & (np.minimum.reduceat(lons, starts) <= grid_east)
+        )
+        if not visible.all():
+            vertex_visible = np.repeat(visible, counts)
+            lats, lons, counts = lats[vertex_visible], lons[vertex_visible], counts[visible]
+        
+        px, py = _lat_lon_to_pixels(lats, lons, origin_x, origin_y, world_scale)
+        xy = np.column_stack((px, py))
+        for pixel_coords in (np.split(xy, np.cumsum(counts)[:-1]) if counts.size else ()):
+            # Draw filled polygon
+            draw.polygon(pixel_coords.ravel().tolist(), fill=(255, 0, 0, 100), outline=(255, 0, 0, 255))
     
     # Draw center marker
     marker_size = max(8, actual_grid_size // 5)
@@ -353,9 +651,8 @@ def create_map_image(
     font = _find_font(font_size)
     small_font = _find_font(small_font_size)
     
-    # Create semi-transparent overlay for text
-    overlay = Image.new("RGBA", composite.size, (0, 0, 0, 0))
-    overlay_draw = ImageDraw.Draw(overlay)
+    # Semi-transparent overlays for text, blended only where they are drawn
+    overlay_draw = _OverlayPanel()
     
     # Draw info box (scaled with image size)
     box_width = max(320, img_width // 4)
@@ -376,7 +673,10 @@ def create_map_image(
     overlay_draw.text((box_x + box_padding, box_y + box_padding + font_size + 5), coord_text, fill=(200, 200, 200), font=small_font)
     overlay_draw.text((box_x + box_padding, box_y + box_padding + font_size + small_font_size + 10), radius_text, fill=(200, 200, 200), font=small_font)
     
-    # Legend (scaled)
+    overlay_draw.blend_onto(composite)
+    
+    # Legend (scaled), a separate panel so the blend region stays small
+    overlay_draw = _OverlayPanel()
     legend_height = max(60, img_height // 15)
     legend_width = max(200, img_width // 6)
     legend_y = img_height - legend_height - 20
@@ -388,11 +688,12 @@ def create_map_image(
     overlay_draw.ellipse([35, legend_y + icon_size * 3, 35 + icon_size, legend_y + icon_size * 4], fill=(0, 255, 0), outline=(0, 100, 0))
     overlay_draw.text((50 + icon_size, legend_y + icon_size * 3 - 3), "Center Point", fill=(255, 255, 255), font=small_font)
     
-    # Composite the overlay
-    composite = Image.alpha_composite(composite.convert("RGBA"), overlay)
+    overlay_draw.blend_onto(composite)
     
     print("Map generation complete!")
-    return composite.convert("RGB")
+    if output_mode == "palette":
+        return _to_palette(composite)
+    return composite
 
 
 def create_simple_marker_map(
@@ -417,29 +718,24 @@ def create_simple_marker_map(
     half_grid = actual_grid_size // 2
     start_tile_x = center_tile_x - half_grid
     start_tile_y = center_tile_y - half_grid
+    world_scale = (1 << zoom) * tile_size
+    origin_x, origin_y = start_tile_x * tile_size, start_tile_y * tile_size
     
     img_width = tile_size * actual_grid_size
     img_height = tile_size * actual_grid_size
-    composite = Image.new("RGB", (img_width, img_height), (200, 200, 200))
+    composite_arr = np.full((img_height, img_width, 3), 200, dtype=np.uint8)
     
     # Build list of tiles to fetch
-    tiles_to_fetch = []
-    for dy in range(actual_grid_size):
-        for dx in range(actual_grid_size):
-            tile_x = start_tile_x + dx
-            tile_y = start_tile_y + dy
-            tiles_to_fetch.append((tile_x, tile_y, zoom))
-    
-    # Fetch tiles in parallel
-    tile_images = fetch_tiles_parallel(tiles_to_fetch, max_workers=20)
-    
-    # Place tiles
-    for dy in range(actual_grid_size):
-        for dx in range(actual_grid_size):
-            tile_x = start_tile_x + dx
-            tile_y = start_tile_y + dy
-            if (tile_x, tile_y) in tile_images:
-                composite.paste(tile_images[(tile_x, tile_y)], (dx * tile_size, dy * tile_size))
+    tiles_to_fetch = _grid_tiles(start_tile_x, start_tile_y, actual_grid_size, zoom)
+    
+    # Fetch tiles in parallel, placing each in the composite as it arrives
+    def place(tile_x: int, tile_y: int, tile_img: Image.Image) -> None:
+        _place_tile(composite_arr, tile_img, tile_x - start_tile_x, tile_y - start_tile_y, tile_size)
+    
+    fetch_tiles_parallel(tiles_to_fetch, max_workers=_TILE_WORKERS, on_tile=place)
+    _schedule_prefetch(start_tile_x, start_tile_y, actual_grid_size, zoom)
+    composite = Image.fromarray(composite_arr)
+    del composite_arr  # PIL holds its own copy; free this before drawing
     
     draw = ImageDraw.Draw(composite, "RGBA")
     
@@ -449,7 +745,7 @@ def create_simple_marker_map(
         zoom, tile_size
     )
     
-    meters_per_pixel = 40075016.686 * math.cos(math.radians(center_lat)) / (256 * 2**zoom)
+    meters_per_pixel = _meters_per_pixel(center_lat, zoom)
     radius_px = int(radius_meters / meters_per_pixel)
     
     # Draw radius circle
@@ -461,9 +757,11 @@ def create_simple_marker_map(
     )
     
     # Draw building markers
-    for lat, lon in building_centers:
-        px, py = lat_lon_to_pixel(lat, lon, start_tile_x, start_tile_y, zoom, tile_size)
-        draw.ellipse([px-3, py-3, px+3, py+3], fill=(255, 0, 0, 200))
+    if building_centers:
+        centers = np.asarray(building_centers, dtype=np.float64).reshape(-1, 2)
+        pxs, pys = _lat_lon_to_pixels(centers[:, 0], centers[:, 1], origin_x, origin_y, world_scale)
+        for px, py in zip(pxs.tolist(), pys.tolist()):
+            draw.ellipse([px-3, py-3, px+3, py+3], fill=(255, 0, 0, 200))
     
     # Draw center marker
     draw.ellipse(
@@ -476,8 +774,7 @@ def create_simple_marker_map(
     font = _find_font(24)
     small_font = _find_font(16)
     
-    overlay = Image.new("RGBA", composite.size, (0, 0, 0, 0))
-    overlay_draw = ImageDraw.Draw(overlay)
+    overlay_draw = _OverlayPanel()
     
     box_padding = 15
     box_x, box_y = 20, 20
@@ -490,6 +787,6 @@ def create_simple_marker_map(
     overlay_draw.text((box_x + box_padding, box_y + box_padding + 52), 
                       f"Radius: {radius_meters/1000:.1f} km | Zoom: {zoom}", fill=(200, 200, 200), font=small_font)
     
-    composite = Image.alpha_composite(composite.convert("RGBA"), overlay)
+    overlay_draw.blend_onto(composite)
     
-    return composite.convert("RGB")
+    return composite